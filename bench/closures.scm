@@ -0,0 +1,11 @@
+; result: 200190000
+; closures nested five deep, each call reaching variables in every frame
+(set mk (lambda (a) (lambda (b) (lambda (c) (lambda (d) (lambda (e)
+  (+ a (+ b (+ c (+ d e))))))))))
+(set i 0)
+(set s 0)
+(while (< i 20000)
+  (begin
+    (set s (+ s (((((mk i) 1) 2) 3) 4)))
+    (set i (+ i 1))))
+s
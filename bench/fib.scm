@@ -0,0 +1,3 @@
+; result: 6765
+(set fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))
+(fib 20)
@@ -0,0 +1,15 @@
+; result: 1249975000
+; build a list with cons, then walk it with car and cdr
+(set l '())
+(set i 0)
+(while (< i 50000)
+  (begin
+    (set l (cons i l))
+    (set i (+ i 1))))
+(set s 0)
+(set p l)
+(while (list? p)
+  (begin
+    (set s (+ s (car p)))
+    (set p (cdr p))))
+s
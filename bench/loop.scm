@@ -0,0 +1,8 @@
+; result: 19999900000
+(set i 0)
+(set s 0)
+(while (< i 200000)
+  (begin
+    (set s (+ s i))
+    (set i (+ i 1))))
+s
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Run the Scheme workloads in this directory and time tokenizing, parsing
+# and evaluating each one separately.  Every workload is run --repeat
+# times per engine; the table shows the median time of each phase and its
+# spread, (max - min) / median.  --save writes the medians to a JSON file
+# and --compare reads such a file and shows how each phase changed.
+#
+#   python3 bench/run.py [--engines compile vm] [--repeat 5]
+#                        [--save base.json] [--compare base.json] [name ...]
+#
+# A workload is a .scm file whose first line is "; result: VALUE", the
+# printed value of its last input.  The literal workload is generated: a
+# quoted list of 100000 numbers that is then summed.
+
+import os, sys, io, json, time, argparse, statistics
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+import parse, eval, scheme
+
+phases = ('tokenize', 'parse', 'eval')
+
+def literalWorkload(n=100000):
+    source = "; result: {}\n".format(n * (n - 1) // 2)
+    source += "(set data '(" + ' '.join(str(i) for i in range(n)) + "))\n"
+    source += "(set s 0)\n(set p data)\n"
+    source += "(while (list? p) (begin (set s (+ s (car p))) (set p (cdr p))))\n"
+    source += "s\n"
+    return source
+
+def workloads():
+    found = {}
+    for name in sorted(os.listdir(here)):
+        if name.endswith('.scm'):
+            with open(os.path.join(here, name)) as fp:
+                found[name[:-4]] = fp.read()
+    found['literal'] = literalWorkload()
+    return found
+
+def expected(source):
+    first = source.split('\n', 1)[0]
+    if first.startswith('; result:'):
+        return first[len('; result:'):].strip()
+    return None
+
+def runOnce(source):
+    # time each phase of one run of source; returns (times, last value)
+    start = time.perf_counter()
+    tokenizer = parse.TokenizingReader(io.StringIO(source), None)
+    inputs = []
+    while True:
+        tokens = scheme.readOne(tokenizer)
+        if tokens is None:
+            break
+        inputs.append(tokens)
+    tokenized = time.perf_counter()
+
+    elts = []
+    for tokens in inputs:
+        parser = parse.Parser(tokens)
+        (elt, j) = parser.input(0)
+        if j < 0 or not parser.finished(j):
+            raise RuntimeError('Syntax error on input that started on line {}'.format(tokens[0][1]))
+        elts.append(elt)
+    parsed = time.perf_counter()
+
+    # every run starts from just the builtins
+    eval.globalEnv.table = eval.Globals(eval.builtins)
+    val = None
+    for elt in elts:
+        val = eval.eval(elt)
+    evaluated = time.perf_counter()
+
+    times = (tokenized - start, parsed - tokenized, evaluated - parsed)
+    return (times, val)
+
+def measure(source, repeat):
+    runs = []
+    for i in range(repeat):
+        (times, val) = runOnce(source)
+        want = expected(source)
+        if want is not None and str(val) != want:
+            raise RuntimeError('expected {} but got {}'.format(want, val))
+        runs.append(times)
+    result = {}
+    for i in range(len(phases)):
+        samples = [ run[i] for run in runs ]
+        median = statistics.median(samples)
+        spread = (max(samples) - min(samples)) / median if median > 0 else 0.0
+        result[phases[i]] = {'median': median, 'spread': spread}
+    return result
+
+def main():
+    argParser = argparse.ArgumentParser(description='Scheme benchmark suite')
+    argParser.add_argument('names', nargs='*', help='workloads to run (default all)')
+    argParser.add_argument('--engines', nargs='+', choices=eval.engines,
+        default=[eval.globalEnv.engine], help='engines to run each workload with')
+    argParser.add_argument('--repeat', type=int, default=5,
+        help='runs of each workload per engine')
+    argParser.add_argument('--save', metavar='FILE', help='write medians to FILE as JSON')
+    argParser.add_argument('--compare', metavar='FILE', help='compare with medians saved in FILE')
+    args = argParser.parse_args()
+
+    available = workloads()
+    names = args.names or sorted(available)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+    saved = {}
+    header = '{:<18} {:<9}'.format('workload', 'phase')
+    header += ' {:>10} {:>8}'.format('median s', 'spread')
+    if args.compare:
+        header += ' {:>10} {:>8}'.format('base s', 'change')
+    print(header)
+    for name in names:
+        for engine in args.engines:
+            eval.globalEnv.engine = engine
+            key = name + '/' + engine
+            result = measure(available[name], args.repeat)
+            saved[key] = {}
+            for phase in phases:
+                median = result[phase]['median']
+                saved[key][phase] = median
+                line = '{:<18} {:<9} {:>10.4f} {:>7.1f}%'.format(
+                    key, phase, median, result[phase]['spread'] * 100)
+                base = baseline.get(key, {}).get(phase)
+                if base:
+                    line += ' {:>10.4f} {:>+7.1f}%'.format(base, (median / base - 1) * 100)
+                print(line)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(saved, fp, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+; result: 100
+; count how often each value of i mod 100 comes up for i below 20000,
+; then count the distinct values
+(set counts (make-table))
+(set i 0)
+(while (< i 20000)
+  (begin
+    (set k (- i (* (/ i 100) 100)))
+    (set n (table-ref counts k))
+    (table-set! counts k (+ (if (null? n) 0 n) 1))
+    (set i (+ i 1))))
+(table-count counts)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Time parse.TokenizingReader over generated sources of growing size to
+# show that tokenizing scales linearly.  Each source is one huge quoted
+# list literal split over lines of --line-length characters, so very long
+# lines are covered as well as large files.
+#
+#   python3 bench/tokenize_scaling.py [--sizes 1 10 100] [--line-length N]
+
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import parse
+
+def generate(path, megabytes, lineLength):
+    words = ['12345', 'alpha', '(', 'beta-gamma', ')', '-7', 'x?', "'q"]
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(path, 'w') as fp:
+        fp.write("'(\n")
+        i = 0
+        while written < target:
+            line = []
+            n = 0
+            while n < lineLength:
+                w = words[i % len(words)]
+                line.append(w)
+                n += len(w) + 1
+                i += 1
+            s = ' '.join(line) + ' ; comment\n'
+            fp.write(s)
+            written += len(s)
+        fp.write(")\n")
+    return os.path.getsize(path)
+
+def tokenize(path):
+    count = 0
+    with open(path) as fp:
+        tokenizer = parse.TokenizingReader(fp, None)
+        get = tokenizer.get
+        while get()[0] is not None:
+            count += 1
+    return count
+
+def main():
+    argParser = argparse.ArgumentParser(description='tokenizer scaling benchmark')
+    argParser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100],
+        help='source sizes in megabytes')
+    argParser.add_argument('--line-length', type=int, default=1024 * 1024,
+        help='characters per source line')
+    args = argParser.parse_args()
+
+    print('{:>8} {:>12} {:>10} {:>10}'.format('MB', 'tokens', 'seconds', 'MB/s'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for megabytes in args.sizes:
+            path = os.path.join(tmp, 'source.scm')
+            size = generate(path, megabytes, args.line_length)
+            start = time.perf_counter()
+            count = tokenize(path)
+            elapsed = time.perf_counter() - start
+            mb = size / (1024 * 1024)
+            print('{:>8.1f} {:>12} {:>10.2f} {:>10.2f}'.format(mb, count, elapsed, mb / elapsed))
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
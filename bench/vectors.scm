@@ -0,0 +1,6 @@
+; result: 333332833333500000
+; the sum of the squares of the numbers below a million, a vector at a time
+(set v (vector-range 0 1000000))
+(set squares (vector* v v))
+(set doubled (vector-map (lambda (x) (+ x x)) (vector-range 0 100000)))
+(vector-sum squares)
@@ -0,0 +1,99 @@
+import time
+
+# Budgets for each evaluation: how many steps it may take, how many cells
+# it may allocate and how long it may run.  A step is a call of a closure
+# or a turn of a while loop, counted the same way by every engine, so a
+# program that never stops always runs out of steps; cells are the cons
+# cells and vector elements that primops make.  Going over a budget is a
+# BudgetExceeded error, which ends the evaluation like any other error.
+#
+# Each thread's (or Interpreter's) limits are in the Meter at
+# eval.globalEnv.meter.  The engines count steps on the meter's fuel,
+# which only runs down while the meter has a step or time limit; when it
+# runs out, refuel() adds up the steps taken and looks at the clock, so
+# the clock is read once every batchSize steps.  Cells are counted by the
+# primops that make them, with the meter's allocate(), once any meter has
+# had a cell limit.
+
+# steps between looks at the clock
+batchSize = 1000
+
+# whether primops count the cells they make, as a one-element list like
+# a Profile's switch; turned on for good by the first meter with a cell
+# limit
+counting = [False]
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+class Meter:
+    def __init__(self, steps=None, cells=None, seconds=None):
+        # the limits, None for none
+        self.maxSteps = steps
+        self.maxCells = cells
+        self.timeLimit = seconds
+
+        # whether the engines count steps at all
+        self.limited = steps is not None or seconds is not None
+        if cells is not None:
+            counting[0] = True
+
+        # steps left before refuel, and the size of the batch they are from
+        self.fuel = 0
+        self.batch = 0
+
+        # what the running evaluation has used so far, not counting the
+        # current batch of steps, and when it has to be done by
+        self.steps = 0
+        self.cells = 0
+        self.deadline = None
+
+    def start(self):
+        # begin accounting for a new evaluation
+        self.steps = 0
+        self.cells = 0
+        if self.timeLimit is not None:
+            self.deadline = time.monotonic() + self.timeLimit
+        self.fill()
+
+    def fill(self):
+        # a batch that runs out just past the step limit, if it is near
+        self.batch = batchSize
+        if self.maxSteps is not None:
+            self.batch = min(batchSize, self.maxSteps - self.steps + 1)
+        self.fuel = self.batch
+
+    def refuel(self):
+        # the engines call this when fuel gets to 0
+        self.steps += self.batch
+        if self.maxSteps is not None and self.steps > self.maxSteps:
+            raise BudgetExceeded('Evaluation took more than {} steps'.format(self.maxSteps))
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('Evaluation took more than {} seconds'.format(self.timeLimit))
+        self.fill()
+
+    def share(self):
+        # the limits, what the running evaluation has used and the time it
+        # has left, for resumed() in a worker process doing part of it
+        left = None
+        if self.deadline is not None:
+            left = self.deadline - time.monotonic()
+        return (self.maxSteps, self.maxCells, self.timeLimit,
+            self.steps + self.batch - self.fuel, self.cells, left)
+
+    def allocate(self, n):
+        self.cells += n
+        if self.maxCells is not None and self.cells > self.maxCells:
+            raise BudgetExceeded('Evaluation allocated more than {} cells'.format(self.maxCells))
+
+def resumed(shared):
+    # a meter that goes on with the evaluation another one shared
+    (steps, cells, seconds, stepsUsed, cellsUsed, left) = shared
+    meter = Meter(steps, cells, seconds)
+    meter.start()
+    meter.steps = stepsUsed
+    meter.cells = cellsUsed
+    if left is not None:
+        meter.deadline = time.monotonic() + left
+    meter.fill()
+    return meter
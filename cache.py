@@ -0,0 +1,115 @@
+import os, hashlib, pickle, tempfile
+
+# A cache of parsed source files.  The first run of a file saves every
+# input it parsed (or the syntax error it hit), together with the prompts
+# printed while reading it, to a cache file; later runs of the same file
+# read that instead of tokenizing and parsing again.  An entry is keyed by
+# a hash of the file's text and of the interpreter's own parsing code, so
+# editing either one makes the old entry stale and it is simply rebuilt.
+# A file that cannot be read, or whose inputs do not match the digest
+# saved with them, is treated the same way.
+#
+# Cache files are pickles: only point the cache at a directory you trust.
+
+# where cache files go: None puts each one next to its source file as
+# <source>.cache, otherwise they are named by a hash of the source path
+directory = None
+
+# whether files are cached at all
+enabled = True
+
+# a hash of the modules that decide what a parsed input looks like,
+# including scheme.py, whose readInputs splits the text into inputs
+interpreterVersion = None
+
+def version():
+    global interpreterVersion
+    if interpreterVersion is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in ('schemeast.py', 'parse.py', 'scheme.py', 'cache.py'):
+            with open(os.path.join(here, name), 'rb') as fp:
+                h.update(fp.read())
+        interpreterVersion = h.hexdigest()
+    return interpreterVersion
+
+def key(text):
+    h = hashlib.sha256()
+    h.update(version().encode())
+    h.update(text.encode())
+    return h.hexdigest()
+
+def path(source):
+    if directory is None:
+        return source + '.cache'
+    name = hashlib.sha256(os.path.abspath(source).encode()).hexdigest()
+    return os.path.join(directory, name + '.cache')
+
+def load(source, text):
+    # the saved inputs for source, or None if there are none or they
+    # were made from a different text or interpreter
+    if not enabled:
+        return None
+    try:
+        with open(path(source), 'rb') as fp:
+            saved = pickle.load(fp)
+        if saved.get('key') != key(text) or saved.get('digest') != digest(saved['inputs']):
+            return None
+    except Exception:
+        # a damaged pickle can fail in almost any way
+        return None
+    return saved['inputs']
+
+def save(source, text, inputs):
+    # inputs is a list of (prompts, form), where form is the pickled
+    # (element, error message, line) of one input, or None after the last
+    if not enabled:
+        return
+    target = path(source)
+    try:
+        folder = os.path.dirname(os.path.abspath(target))
+        os.makedirs(folder, exist_ok=True)
+        # write a temporary file and rename it over the old entry, so a
+        # process starting meanwhile never sees half a cache file
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump({'key': key(text), 'digest': digest(inputs), 'inputs': inputs},
+                fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+    except OSError:
+        pass
+
+def digest(inputs):
+    # a hash of saved inputs, so a damaged form is not run
+    h = hashlib.sha256()
+    for (prompts, form) in inputs:
+        h.update(prompts.encode())
+        h.update(form or b'')
+    return h.hexdigest()
+
+def dumpForm(form):
+    return pickle.dumps(form, pickle.HIGHEST_PROTOCOL)
+
+def loadForm(data):
+    return pickle.loads(data)
+
+class Recorder:
+    # a stream that passes writes through to out (unless it is None) and
+    # remembers them until they are taken
+    def __init__(self, out):
+        self.out = out
+        self.text = []
+
+    def write(self, s):
+        self.text.append(s)
+        if self.out is not None:
+            self.out.write(s)
+
+    def flush(self):
+        if self.out is not None:
+            self.out.flush()
+
+    def take(self):
+        s = ''.join(self.text)
+        self.text = []
+        return s
@@ -0,0 +1,229 @@
+import schemeast as ast
+import eval
+import resolve
+import optimizer
+import tasks
+import memo
+
+# A CEK machine: the control is the expression being evaluated (or the
+# value just computed), the environment is the frame it runs in, and the
+# continuation is an explicit stack of pending work kept in a Python list.
+# Nothing recurses in Python, so non-tail recursion in Scheme is limited
+# only by memory, and a call in tail position (a branch of if, the last
+# expression of begin, a closure body) pushes nothing, so tail calls run
+# in constant space.
+
+# continuation frames, kept on the stack as tuples whose first element
+# is one of these tags
+IF, WHILETEST, WHILEBODY, SET, DEFINE, BEGIN, ARG, REMEMBER = range(8)
+
+def run(exp):
+    resolve.resolve(exp)
+    return execute(exp, None)
+
+def apply(f, args):
+    # call a primop or closure on a list of already evaluated arguments
+    exp = ast.ApExp(ast.ValExp(f), [ ast.ValExp(arg) for arg in args ])
+    return execute(exp, None)
+
+def execute(exp, rho, task=None):
+    # the value of exp in rho.  In a task (see tasks.py) the continuation
+    # is the task's stack, and an operation that has to wait leaves it
+    # there and makes this return None; running exp again on the same
+    # stack, as the value the operation gave, carries on from there
+    ValExp, VarExp, Lambda, ApExp = ast.ValExp, ast.VarExp, ast.Lambda, ast.ApExp
+    PrimOp, Closure, Frame, Box = ast.PrimOp, ast.Closure, ast.Frame, ast.Box
+    Operation = tasks.Operation
+    Memo = memo.Memo
+    nilValue = eval.nilValue
+    table = eval.globalEnv.table
+    holds = optimizer.holds
+    meter = eval.globalEnv.meter
+
+    stack = [] if task is None else task.stack
+    push = stack.append
+    pop = stack.pop
+
+    while True:
+        # evaluate exp in rho until we have a value
+        t = type(exp)
+        if t is ValExp:
+            val = exp.sxp
+
+        elif t is VarExp:
+            address = exp.address
+            if address is None:
+                if exp.version == table.version:
+                    val = exp.cell.value
+                else:
+                    val = table.resolve(exp).value
+            else:
+                if address[0] == 0:
+                    val = rho.values[address[1]]
+                else:
+                    val = rho.enclosed[address[1]]
+                if exp.boxed:
+                    val = val.value
+
+        elif t is Lambda:
+            captured = []
+            for (depth, slot) in exp.free:
+                captured.append(rho.values[slot] if depth == 0 else rho.enclosed[slot])
+            val = Closure(exp, tuple(captured))
+
+        else:
+            op = exp.op
+            if op == 'if':
+                push((IF, exp, rho))
+                exp = exp.args[0]
+                continue
+            elif op == 'while':
+                push((WHILETEST, exp, rho))
+                exp = exp.args[0]
+                continue
+            elif op == 'set':
+                push((SET, exp, rho))
+                exp = exp.args[1]
+                continue
+            elif op == 'define':
+                push((DEFINE, exp))
+                exp = exp.args[1]
+                continue
+            elif op == 'begin':
+                if len(exp.args) > 1:
+                    push((BEGIN, exp, rho, 1))
+                exp = exp.args[0]
+                continue
+            elif exp.folded is not None and holds(exp.folded[1], table):
+                val = exp.folded[0]
+            else:
+                push((ARG, exp, rho, []))
+                exp = op
+                continue
+
+        # return val to the continuation until one of them has more
+        # evaluating to do
+        while True:
+            if not stack:
+                return val
+            k = pop()
+            tag = k[0]
+
+            if tag == ARG:
+                exp, rho, vals = k[1], k[2], k[3]
+                vals.append(val)
+                args = exp.args
+                if len(vals) == 1:
+                    # the operator: check it before evaluating the
+                    # arguments, as the tree engine does
+                    if isinstance(val, Closure):
+                        if len(val.f.formals) != len(args):
+                            raise RuntimeError("Num args don't match in closure")
+                        if type(val.environment) is not tuple:
+                            raise RuntimeError("Cannot apply a closure made by the tree engine")
+                        if meter.limited:
+                            meter.fuel -= 1
+                            if meter.fuel <= 0:
+                                meter.refuel()
+                    elif isinstance(val, PrimOp):
+                        if val.nargs != len(args):
+                            raise RuntimeError("Num args don't match in primop " + val.name)
+                    else:
+                        raise RuntimeError("Cannot apply " + str(val))
+                if len(vals) <= len(args):
+                    push(k)
+                    exp = args[len(vals) - 1]
+                    break
+
+                # every argument is in, apply the operator
+                f = vals[0]
+                if type(f) is Memo:
+                    # run the closure here unless the memo has its result,
+                    # and remember what it returns
+                    key, val = f.find(vals[1:])
+                    if val is not None:
+                        continue
+                    push((REMEMBER, f, key))
+                    f = f.closure
+                    if type(f.environment) is not tuple:
+                        raise RuntimeError("Cannot apply a closure made by the tree engine")
+                    if meter.limited:
+                        meter.fuel -= 1
+                        if meter.fuel <= 0:
+                            meter.refuel()
+                if isinstance(f, Closure):
+                    lam = f.f
+                    rho = Frame(vals[1:], f.environment)
+                    for slot in lam.boxes:
+                        rho.values[slot] = Box(rho.values[slot])
+                    exp = lam.body
+                    break
+                else:
+                    if f.f2 is not None:
+                        val = f.f2(vals[1], vals[2])
+                    elif f.f1 is not None:
+                        val = f.f1(vals[1])
+                    elif task is not None and isinstance(f, Operation):
+                        val = f.attempt(task, vals[1:])
+                        if val is None:
+                            return None
+                    else:
+                        val = f.f(vals[1:])
+                    continue
+
+            elif tag == IF:
+                exp, rho = k[1], k[2]
+                if val is nilValue:
+                    exp = exp.args[2]
+                else:
+                    exp = exp.args[1]
+                break
+
+            elif tag == BEGIN:
+                exp, rho, i = k[1], k[2], k[3]
+                if i + 1 < len(exp.args):
+                    push((BEGIN, exp, rho, i + 1))
+                exp = exp.args[i]
+                break
+
+            elif tag == WHILETEST:
+                if val is nilValue:
+                    continue
+                if meter.limited:
+                    meter.fuel -= 1
+                    if meter.fuel <= 0:
+                        meter.refuel()
+                exp, rho = k[1], k[2]
+                push((WHILEBODY, exp, rho))
+                exp = exp.args[1]
+                break
+
+            elif tag == WHILEBODY:
+                exp, rho = k[1], k[2]
+                push((WHILETEST, exp, rho))
+                exp = exp.args[0]
+                break
+
+            elif tag == SET:
+                exp, rho = k[1], k[2]
+                address = exp.address
+                if address is None:
+                    table.assign(exp.args[0], val)
+                elif exp.boxed:
+                    if address[0] == 0:
+                        rho.values[address[1]].value = val
+                    else:
+                        rho.enclosed[address[1]].value = val
+                else:
+                    rho.values[address[1]] = val
+                continue
+
+            elif tag == DEFINE:
+                name = k[1].args[0]
+                table.assign(name, val)
+                val = ast.SymSxp(name)
+                continue
+
+            elif tag == REMEMBER:
+                k[1].remember(k[2], val)
+                continue
@@ -0,0 +1,319 @@
+import schemeast as ast
+import eval
+import resolve
+import optimizer
+
+# The compiler walks an expression once and turns it into a tree of
+# Python closures.  Each closure takes the frame to run in and returns
+# the value of its expression, so running a compiled form does no
+# isinstance checks or keyword comparisons on the expression itself.
+# Variables are reached through the addresses handed out by the
+# resolver, in the frame or in the running closure's captured variables;
+# names no lambda binds live in the table of globals, and a reference to
+# one keeps the cell it found there (see eval.Globals).
+#
+# Compiled code works on the table of globals it was compiled with, so a
+# lambda remembers which one that was.  A closure called while another
+# table is in use (it came from another Interpreter) has its body
+# compiled again for that one.
+
+def compile(exp):
+    resolve.resolve(exp)
+    return compileExp(exp)
+
+def compileExp(exp):
+    if isinstance(exp, ast.ValExp):
+        return compileValue(exp)
+    elif isinstance(exp, ast.Lambda):
+        return compileLambda(exp)
+    elif isinstance(exp, ast.VarExp):
+        return compileVariable(exp)
+    elif isinstance(exp, ast.ApExp):
+        if exp.op == 'if':
+            return compileIf(exp)
+        elif exp.op == 'while':
+            return compileWhile(exp)
+        elif exp.op == 'set':
+            return compileSet(exp)
+        elif exp.op == 'define':
+            return compileDefine(exp)
+        elif exp.op == 'begin':
+            return compileBegin(exp)
+        else:
+            return compileApplication(exp)
+    raise RuntimeError("Cannot compile " + repr(exp))
+
+def compileValue(exp):
+    sxp = exp.sxp
+    def run(rho):
+        return sxp
+    return run
+
+def compileLambda(exp):
+    # the body is compiled once, here, and shared by every closure; each
+    # closure captures just the variables its body uses
+    exp.code = compileBody(exp)
+    exp.codeTable = eval.globalEnv.table
+    Closure = ast.Closure
+    profile = eval.globalEnv.profile
+    profiling = profile.switch
+    fetches = [ compileFetch(address) for address in exp.free ]
+    if not fetches:
+        def run(rho):
+            if profiling[0]:
+                profile.allocated(1)
+            return Closure(exp, ())
+        return run
+    def run(rho):
+        if profiling[0]:
+            profile.allocated(1)
+        return Closure(exp, tuple([ fetch(rho) for fetch in fetches ]))
+    return run
+
+def compileBody(lam):
+    # a lambda's body, which first puts the formals that need one in a box
+    body = compileExp(lam.body)
+    boxes = lam.boxes
+    if not boxes:
+        return body
+    Box = ast.Box
+    def run(rho):
+        values = rho.values
+        for slot in boxes:
+            values[slot] = Box(values[slot])
+        return body(rho)
+    return run
+
+def bodyFor(f, table):
+    # the compiled body of closure f, for the table of globals in use
+    lam = f.f
+    if not isinstance(f.environment, tuple):
+        raise RuntimeError("Cannot apply a closure made by the tree engine")
+    lam.code = compileBody(lam)
+    lam.codeTable = table
+    return lam.code
+
+def compileFetch(address):
+    # what is at address, without looking inside a box
+    depth, slot = address
+    if depth == 0:
+        def run(rho):
+            return rho.values[slot]
+    else:
+        def run(rho):
+            return rho.enclosed[slot]
+    return run
+
+def compileVariable(exp):
+    if exp.address is None:
+        return compileGlobal(exp)
+    if not exp.boxed:
+        return compileFetch(exp.address)
+    depth, slot = exp.address
+    if depth == 0:
+        def run(rho):
+            return rho.values[slot].value
+    else:
+        def run(rho):
+            return rho.enclosed[slot].value
+    return run
+
+def compileGlobal(exp):
+    table = eval.globalEnv.table
+    def run(rho):
+        if exp.version == table.version:
+            return exp.cell.value
+        return table.resolve(exp).value
+    return run
+
+def compileIf(exp):
+    test = compileExp(exp.args[0])
+    then = compileExp(exp.args[1])
+    other = compileExp(exp.args[2])
+    nilValue = eval.nilValue
+    def run(rho):
+        if test(rho) is nilValue:
+            return other(rho)
+        return then(rho)
+    return run
+
+def compileWhile(exp):
+    test = compileExp(exp.args[0])
+    body = compileExp(exp.args[1])
+    nilValue = eval.nilValue
+    meter = eval.globalEnv.meter
+    def run(rho):
+        while test(rho) is not nilValue:
+            if meter.limited:
+                meter.fuel -= 1
+                if meter.fuel <= 0:
+                    meter.refuel()
+            body(rho)
+        return nilValue
+    return run
+
+def compileSet(exp):
+    value = compileExp(exp.args[1])
+    if exp.address is None:
+        name = exp.args[0]
+        assign = eval.globalEnv.table.assign
+        def run(rho):
+            val = value(rho)
+            assign(name, val)
+            return val
+        return run
+    if exp.boxed:
+        fetch = compileFetch(exp.address)
+        def run(rho):
+            val = value(rho)
+            fetch(rho).value = val
+            return val
+        return run
+    # only boxed variables can be captured, so this one is in the frame
+    slot = exp.address[1]
+    def run(rho):
+        val = rho.values[slot] = value(rho)
+        return val
+    return run
+
+def compileDefine(exp):
+    value = compileExp(exp.args[1])
+    name = exp.args[0]
+    sym = ast.SymSxp(name)
+    assign = eval.globalEnv.table.assign
+    def run(rho):
+        assign(name, value(rho))
+        return sym
+    return run
+
+def compileBegin(exp):
+    body = [ compileExp(elt) for elt in exp.args ]
+    first, last = body[:-1], body[-1]
+    def run(rho):
+        for f in first:
+            f(rho)
+        return last(rho)
+    return run
+
+def compileApplication(exp):
+    op = compileExp(exp.op)
+    args = [ compileExp(elt) for elt in exp.args ]
+    call = compileCall(op, args)
+    if exp.folded is not None:
+        return compileFolded(exp.folded, call)
+    builtin = exp.op.builtin if isinstance(exp.op, ast.VarExp) else None
+    if builtin is not None and builtin.nargs == len(args):
+        return compileBuiltinCall(exp.op.name, builtin, args, call)
+    return call
+
+def compileFolded(folded, call):
+    # the value the optimizer worked out, while the builtins it used are
+    # still bound to their names; otherwise make the call after all
+    value, guards = folded
+    table = eval.globalEnv.table
+    if len(guards) == 1:
+        ((name, prim),) = guards
+        cell = table.cells.get(name)
+        if cell is None:
+            return call
+        def run(rho):
+            if cell.value is prim:
+                return value
+            return call(rho)
+        return run
+    holds = optimizer.holds
+    def run(rho):
+        if holds(guards, table):
+            return value
+        return call(rho)
+    return run
+
+def compileBuiltinCall(name, prim, args, call):
+    # call a builtin straight through its function, with no checks on
+    # what the operator is, while the global still holds it
+    cell = eval.globalEnv.table.cells.get(name)
+    if cell is None:
+        return call
+    f = prim.f
+    profile = eval.globalEnv.profile
+    profiling = profile.switch
+    if prim.f1 is not None:
+        f1 = prim.f1
+        arg = args[0]
+        def run(rho):
+            if cell.value is prim and not profiling[0]:
+                return f1(arg(rho))
+            return call(rho)
+    elif prim.f2 is not None:
+        f2 = prim.f2
+        left, right = args
+        def run(rho):
+            if cell.value is prim and not profiling[0]:
+                return f2(left(rho), right(rho))
+            return call(rho)
+    else:
+        def run(rho):
+            if cell.value is prim and not profiling[0]:
+                return f([ arg(rho) for arg in args ])
+            return call(rho)
+    return run
+
+def compileCall(op, args):
+    nargs = len(args)
+    PrimOp, Closure, Frame = ast.PrimOp, ast.Closure, ast.Frame
+    profile = eval.globalEnv.profile
+    profiling = profile.switch
+    table = eval.globalEnv.table
+    meter = eval.globalEnv.meter
+    def run(rho):
+        # the operator is checked before the arguments are evaluated, as
+        # the tree engine does, so a call that fails has no side effects
+        f = op(rho)
+        if isinstance(f, Closure):
+            lam = f.f
+            if len(lam.formals) != nargs:
+                raise RuntimeError("Num args don't match in closure")
+            if profiling[0]:
+                return profile.call(f, [ arg(rho) for arg in args ])
+            code = lam.code
+            if lam.codeTable is not table:
+                # made by another engine or interpreter, or unpickled
+                code = bodyFor(f, table)
+            if meter.limited:
+                meter.fuel -= 1
+                if meter.fuel <= 0:
+                    meter.refuel()
+            return code(Frame([ arg(rho) for arg in args ], f.environment))
+        elif isinstance(f, PrimOp):
+            if f.nargs != nargs:
+                raise RuntimeError("Num args don't match in primop " + f.name)
+            if profiling[0]:
+                return profile.call(f, [ arg(rho) for arg in args ])
+            if f.f2 is not None:
+                return f.f2(args[0](rho), args[1](rho))
+            if f.f1 is not None:
+                return f.f1(args[0](rho))
+            return f.f([ arg(rho) for arg in args ])
+        raise RuntimeError("Cannot apply " + str(f))
+    return run
+
+def apply(f, args):
+    # call a primop or closure on a list of already evaluated arguments
+    if isinstance(f, ast.Closure):
+        lam = f.f
+        if len(lam.formals) != len(args):
+            raise RuntimeError("Num args don't match in closure")
+        meter = eval.globalEnv.meter
+        if meter.limited:
+            meter.fuel -= 1
+            if meter.fuel <= 0:
+                meter.refuel()
+        code = lam.code
+        if lam.codeTable is not eval.globalEnv.table:
+            code = bodyFor(f, eval.globalEnv.table)
+        return code(ast.Frame(list(args), f.environment))
+    elif isinstance(f, ast.PrimOp):
+        if f.nargs != len(args):
+            raise RuntimeError("Num args don't match in primop " + f.name)
+        return f.f(args)
+    raise RuntimeError("Cannot apply " + str(f))
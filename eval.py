@@ -1,155 +1,421 @@
-import ast 
-
-nilValue = ast.NilSxp()
-trueValue = ast.SymSxp('T')
-
-def primoplus(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
-    return ast.NumSxp(v1.number + v2.number)
-
-def primominus(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
-    return ast.NumSxp(v1.number - v2.number)
-
-def primomult(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
-    return ast.NumSxp(v1.number * v2.number)
-
-def primodiv(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
-    return ast.NumSxp(v1.number // v2.number)
-
-def primolt(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
+import sys, threading, itertools, types
+import schemeast as ast
+import compiler
+import cek
+import vm
+import profiler
+import memo
+import pmap
+import optimizer
+import vector
+import tasks
+import budget
+
+nilValue = ast.nil
+trueValue = ast.true
+
+def primoplus(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of + not numbers")
+    return ast.makeNum(v1.number + v2.number)
+
+def primominus(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of - not numbers")
+    return ast.makeNum(v1.number - v2.number)
+
+def primomult(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of * not numbers")
+    return ast.makeNum(v1.number * v2.number)
+
+def primodiv(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of / not numbers")
+    if v2.number == 0:
+        raise RuntimeError("Division by zero")
+    return ast.makeNum(v1.number // v2.number)
+
+def primolt(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of < not numbers")
     if v1.number < v2.number:
         return trueValue
     return nilValue
 
-def primogt(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    assert(isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp))
+def primogt(v1, v2):
+    if not (isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp)):
+        raise RuntimeError("Arguments of > not numbers")
     if v1.number > v2.number:
         return trueValue
     return nilValue
 
-def primoeq(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
+def primoeq(v1, v2):
     if isinstance(v1, ast.NumSxp) and isinstance(v2, ast.NumSxp):
         if v1.number == v2.number:
             return trueValue
-    if isinstance(v1, ast.SymSxp) and isinstance(v2, ast.SymSxp):
-        if v1.symval == v2.symval:
-            return trueValue
-    if v1 == nilValue and v2 == nilValue:
+        return nilValue
+    if ast.equal(v1, v2):
         return trueValue
     else:
         return nilValue
 
-def primocons(args):
-    assert(len(args) == 2)
-    v1 = args[0]
-    v2 = args[1]
-    if not isinstance(v2, ast.ListSxp) and v2 != nilValue:
+def primocons(v1, v2):
+    if not isinstance(v2, ast.ListSxp) and v2 is not nilValue:
         raise RuntimeError("Second argument in cons not list or nil sxp")
-    else:
-        return ast.ListSxp(v1, v2)
+    if budget.counting[0]:
+        globalEnv.meter.allocate(1)
+    return ast.ListSxp(v1, v2)
 
-def primocar(args):
-    assert(len(args) == 1)
-    listobj = args[0]
-    assert(isinstance(listobj, ast.ListSxp))
+def primocar(listobj):
+    if not isinstance(listobj, ast.ListSxp):
+        raise RuntimeError("Argument of car not a list")
     return listobj.carval
 
-def primocdr(args):
-    assert(len(args) == 1)
-    listobj = args[0]
-    assert(isinstance(listobj, ast.ListSxp))
+def primocdr(listobj):
+    if not isinstance(listobj, ast.ListSxp):
+        raise RuntimeError("Argument of cdr not a list")
     return listobj.cdrval
 
-def primonum(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.NumSxp):
+def primonum(v):
+    if isinstance(v, ast.NumSxp):
+        return trueValue
+    return nilValue
+
+def primosym(v):
+    if isinstance(v, ast.SymSxp):
+        return trueValue
+    return nilValue
+
+def primolist(v):
+    if isinstance(v, ast.ListSxp):
         return trueValue
     return nilValue
 
-def primosym(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.SymSxp):
+def primonull(v):
+    if isinstance(v, ast.NilSxp):
         return trueValue
     return nilValue
 
-def primolist(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.ListSxp):
+def primoprimop(v):
+    if isinstance(v, ast.PrimOp):
         return trueValue
     return nilValue
 
-def primonull(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.NilSxp):
+def primoclose(v):
+    if isinstance(v, ast.Closure):
         return trueValue
     return nilValue
 
-def primoprimop(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.PrimOp):
+def primotable(v):
+    if isinstance(v, ast.TableSxp):
         return trueValue
     return nilValue
 
-def primoclose(args):
-    assert(len(args) == 1)
-    if isinstance(args[0], ast.Closure):
+def primomaketable(args):
+    return ast.TableSxp()
+
+def checkTable(name, table):
+    if not isinstance(table, ast.TableSxp):
+        raise RuntimeError("First argument of " + name + " not a table")
+
+def primotableref(table, key):
+    # the value for key in table, or nil if it has none
+    checkTable('table-ref', table)
+    entry = table.entries.get(ast.hashKey(key))
+    if entry is None:
+        return nilValue
+    return entry[1]
+
+def primotableset(args):
+    table, key, value = args
+    checkTable('table-set!', table)
+    table.entries[ast.hashKey(key)] = (key, value)
+    return value
+
+def primotabledelete(table, key):
+    # T if table had key, else nil
+    checkTable('table-delete!', table)
+    if table.entries.pop(ast.hashKey(key), None) is None:
+        return nilValue
+    return trueValue
+
+def primotablecount(table):
+    checkTable('table-count', table)
+    return ast.makeNum(len(table.entries))
+
+def primotablekeys(table):
+    # a list of table's keys, in the order they were added
+    checkTable('table-keys', table)
+    if budget.counting[0]:
+        globalEnv.meter.allocate(len(table.entries))
+    return ast.buildList([ key for (key, value) in table.entries.values() ], nilValue)
+
+def primotableiterator(table):
+    checkTable('table-iterator', table)
+    return ast.KeyIterator(table)
+
+def checkIterator(name, it):
+    if not isinstance(it, ast.KeyIterator):
+        raise RuntimeError("Argument of " + name + " not an iterator")
+
+def primoiteratordone(it):
+    checkIterator('iterator-done?', it)
+    if it.ahead is None:
         return trueValue
     return nilValue
 
-def primoprint(args):
-    if len(args) == 1:
-        print(str(args[0]))
-        return args[0]
+def primoiteratornext(it):
+    # the next key, which the iterator then moves past
+    checkIterator('iterator-next', it)
+    if it.ahead is None:
+        raise RuntimeError("No more keys in iterator-next")
+    return it.advance()[0]
+
+def primoprint(v):
+    out = globalEnv.output if globalEnv.output is not None else sys.stdout
+    ast.writeSxp(v, out)
+    out.write('\n')
+    return v
+
+def primoprofile(v):
+    if v is nilValue:
+        globalEnv.profile.stop()
+    elif globalEnv.engine != 'compile':
+        raise RuntimeError("profiling needs the compile engine")
+    else:
+        globalEnv.profile.start()
+    return v
+
+def primoprofilereport(args):
+    globalEnv.profile.report(globalEnv.output if globalEnv.output is not None else sys.stdout)
     return nilValue
 
+def primomemoize(f):
+    if not isinstance(f, ast.Closure):
+        raise RuntimeError("memoize needs a closure")
+    return memo.Memo(f, memo.defaultLimit)
+
+def primomemoizebounded(f, limit):
+    if not isinstance(f, ast.Closure):
+        raise RuntimeError("memoize-bounded needs a closure")
+    if not isinstance(limit, ast.NumSxp) or limit.number < 1:
+        raise RuntimeError("memoize-bounded needs a positive limit")
+    return memo.Memo(f, limit.number)
+
+def primomemostats(m):
+    # (hits misses entries) of a memoized closure
+    if not isinstance(m, memo.Memo):
+        raise RuntimeError("memo-stats needs a memoized closure")
+    counts = [m.hits, m.misses, len(m.entries)]
+    return ast.buildList([ ast.makeNum(n) for n in counts ], nilValue)
+
+def primopmap(f, lst):
+    if not isinstance(f, ast.Closure) and not isinstance(f, ast.PrimOp):
+        raise RuntimeError("pmap needs a function")
+    items = []
+    while isinstance(lst, ast.ListSxp):
+        items.append(lst.carval)
+        lst = lst.cdrval
+    if lst is not nilValue:
+        raise RuntimeError("pmap needs a list")
+    if budget.counting[0]:
+        globalEnv.meter.allocate(len(items))
+    return ast.buildList(pmap.pmap(f, items), nilValue)
+
 fxns = {
-    '+': ast.PrimOp('+', primoplus, 2), 
-    '-': ast.PrimOp('-', primominus, 2), 
-    '*': ast.PrimOp('*', primomult, 2), 
-    '/': ast.PrimOp('/', primodiv, 2), 
-    '<': ast.PrimOp('<', primolt, 2), 
-    '>': ast.PrimOp('>', primogt, 2), 
-    '=': ast.PrimOp('=', primoeq, 2), 
-    'cons': ast.PrimOp('cons', primocons, 2), 
-    'car': ast.PrimOp('car', primocar, 1), 
-    'cdr': ast.PrimOp('cdr', primocdr, 1), 
-    'number?': ast.PrimOp('number?', primonum, 1), 
-    'symbol?': ast.PrimOp('symbol?', primosym, 1), 
-    'list?': ast.PrimOp('list?', primolist, 1), 
-    'null?': ast.PrimOp('null?', primonull, 1), 
-    'print': ast.PrimOp('print', primoprint, 1), 
-    'primop?': ast.PrimOp('primop?', primoprimop, 1), 
-    'closure?': ast.PrimOp('closure?', primoclose, 1)
+    '+': ast.PrimOp.binary('+', primoplus),
+    '-': ast.PrimOp.binary('-', primominus),
+    '*': ast.PrimOp.binary('*', primomult),
+    '/': ast.PrimOp.binary('/', primodiv),
+    '<': ast.PrimOp.binary('<', primolt),
+    '>': ast.PrimOp.binary('>', primogt),
+    '=': ast.PrimOp.binary('=', primoeq),
+    'cons': ast.PrimOp.binary('cons', primocons),
+    'car': ast.PrimOp.unary('car', primocar),
+    'cdr': ast.PrimOp.unary('cdr', primocdr),
+    'number?': ast.PrimOp.unary('number?', primonum),
+    'symbol?': ast.PrimOp.unary('symbol?', primosym),
+    'list?': ast.PrimOp.unary('list?', primolist),
+    'null?': ast.PrimOp.unary('null?', primonull),
+    'print': ast.PrimOp.unary('print', primoprint),
+    'primop?': ast.PrimOp.unary('primop?', primoprimop),
+    'closure?': ast.PrimOp.unary('closure?', primoclose),
+    'table?': ast.PrimOp.unary('table?', primotable),
+    'make-table': ast.PrimOp('make-table', primomaketable, 0),
+    'table-ref': ast.PrimOp.binary('table-ref', primotableref),
+    'table-set!': ast.PrimOp('table-set!', primotableset, 3),
+    'table-delete!': ast.PrimOp.binary('table-delete!', primotabledelete),
+    'table-count': ast.PrimOp.unary('table-count', primotablecount),
+    'table-keys': ast.PrimOp.unary('table-keys', primotablekeys),
+    'table-iterator': ast.PrimOp.unary('table-iterator', primotableiterator),
+    'iterator-done?': ast.PrimOp.unary('iterator-done?', primoiteratordone),
+    'iterator-next': ast.PrimOp.unary('iterator-next', primoiteratornext),
+    'vector?': ast.PrimOp.unary('vector?', vector.isVector),
+    'vector-length': ast.PrimOp.unary('vector-length', vector.length),
+    'vector-ref': ast.PrimOp.binary('vector-ref', vector.ref),
+    'vector-set!': ast.PrimOp('vector-set!', vector.store, 3),
+    'list->vector': ast.PrimOp.unary('list->vector', vector.fromList),
+    'vector->list': ast.PrimOp.unary('vector->list', vector.toList),
+    'vector-range': ast.PrimOp.binary('vector-range', vector.makeRange),
+    'vector-sum': ast.PrimOp.unary('vector-sum', vector.total),
+    'vector-map': ast.PrimOp.binary('vector-map', vector.mapValues),
+    'vector+': ast.PrimOp.binary('vector+', vector.add),
+    'vector-': ast.PrimOp.binary('vector-', vector.subtract),
+    'vector*': ast.PrimOp.binary('vector*', vector.multiply),
+    'vector/': ast.PrimOp.binary('vector/', vector.divide),
+    'profile': ast.PrimOp.unary('profile', primoprofile),
+    'profile-report': ast.PrimOp('profile-report', primoprofilereport, 0),
+    'memoize': ast.PrimOp.unary('memoize', primomemoize),
+    'memoize-bounded': ast.PrimOp.binary('memoize-bounded', primomemoizebounded),
+    'memo-stats': ast.PrimOp.unary('memo-stats', primomemostats),
+    'pmap': ast.PrimOp.binary('pmap', primopmap),
+    'spawn': ast.PrimOp.unary('spawn', tasks.spawn),
+    'make-channel': ast.PrimOp.unary('make-channel', tasks.makeChannel),
+    'yield': tasks.Operation('yield', tasks.yieldTask, 0),
+    'send': tasks.Operation('send', tasks.send, 2),
+    'recv': tasks.Operation('recv', tasks.recv, 1),
+    'sleep': tasks.Operation('sleep', tasks.sleep, 1)
 }
 
-globalEnv = ast.Environment(fxns, None)
+# the builtins as they were before any program could rebind them, which
+# every table of globals starts from and nothing may change
+builtins = types.MappingProxyType(dict(fxns))
+
+# every table of globals, and every state of one, gets its own version
+versions = itertools.count()
+
+class Globals:
+    # a table of global variables, with a cell for each name that has
+    # been bound.  A cell is never removed or replaced, so a reference
+    # keeps the one it found, together with the table's version then;
+    # the version changes whenever a name is bound for the first time,
+    # and no two tables ever share one, so a reference that sees a
+    # different version looks its name up again
+    def __init__(self, values):
+        self.cells = {}
+        for (name, value) in values.items():
+            self.cells[name] = ast.Cell(name, value)
+        self.version = next(versions)
+
+    def get(self, name, default=None):
+        cell = self.cells.get(name)
+        if cell is None:
+            return default
+        return cell.value
+
+    def items(self):
+        return [ (name, cell.value) for (name, cell) in self.cells.items() ]
+
+    def resolve(self, exp):
+        # the cell of the global the VarExp exp names, which exp keeps
+        cell = self.cells.get(exp.name)
+        if cell is None:
+            raise RuntimeError("Unbound variable " + exp.name)
+        exp.cell = cell
+        exp.version = self.version
+        return cell
+
+    def lookup(self, name):
+        cell = self.cells.get(name)
+        if cell is None:
+            raise RuntimeError("Unbound variable " + name)
+        return cell.value
+
+    def assign(self, name, value):
+        # set name, binding it if it is new; for both set and define
+        cell = self.cells.get(name)
+        if cell is None:
+            self.cells[name] = ast.Cell(name, value)
+            self.version = next(versions)
+        else:
+            cell.value = value
+
+# the table of globals the main thread runs with
+mainGlobals = Globals(fxns)
+
+# the evaluators eval() can use: 'compile' turns each input into Python
+# closures before running it, 'cek' runs it on an explicit continuation
+# stack so deep recursion cannot overflow Python's stack, 'vm' compiles it
+# to bytecode for a stack machine, and 'tree' is the reference
+# tree-walker below
+engines = ('compile', 'cek', 'vm', 'tree')
+
+class GlobalEnvironment(threading.local):
+    # what evaluation runs with, one per thread: every thread starts with
+    # the shared mainGlobals and the compile engine with the optimizer on,
+    # and an Interpreter (see interpreter.py) puts its own state here
+    # while it runs.  engine is one of engines, optimizing says whether
+    # eval() runs the optimizer over each input first, output is where
+    # print writes (None means sys.stdout), scheduler runs the thread's
+    # tasks, once there are any, meter holds the limits on each
+    # evaluation (see budget.py) and profile what the profiler found
+    def __init__(self, table):
+        self.table = table
+        self.engine = 'compile'
+        self.optimizing = True
+        self.output = None
+        self.scheduler = None
+        self.meter = budget.Meter()
+        self.profile = profiler.Profile()
 
-def eval(exp, rho):
+globalEnv = GlobalEnvironment(mainGlobals)
+
+# evaluate a top-level expression, then run the tasks it left ready
+def eval(exp):
+    globalEnv.meter.start()
+    if globalEnv.optimizing:
+        exp = optimizer.optimize(exp)
+    engine = globalEnv.engine
+    try:
+        if engine == 'tree':
+            val = treeEval(exp, None)
+        elif engine == 'cek':
+            val = cek.run(exp)
+        elif engine == 'vm':
+            val = vm.run(exp)
+        else:
+            val = compiler.compile(exp)(None)
+        if globalEnv.scheduler is not None:
+            globalEnv.scheduler.runAll()
+    except RecursionError:
+        raise tooDeep()
+    return val
+
+# the compile and tree engines recurse in Python, so Scheme recursion
+# deep enough to use up Python's stack is a budget error there, ending
+# the evaluation like going over --max-steps does on the other engines
+def tooDeep():
+    return budget.BudgetExceeded('Recursion too deep for the {} engine'.format(globalEnv.engine))
+
+# call a closure or primop on already evaluated arguments with the
+# running engine, for primops such as memoize that call back into Scheme
+def apply(f, args):
+    engine = globalEnv.engine
+    if engine == 'cek':
+        return cek.apply(f, args)
+    elif engine == 'vm':
+        return vm.apply(f, args)
+    elif engine == 'tree' and isinstance(f, ast.Closure):
+        if len(f.f.formals) != len(args):
+            raise RuntimeError("Num args don't match in closure")
+        checkTreeClosure(f)
+        meter = globalEnv.meter
+        if meter.limited:
+            meter.fuel -= 1
+            if meter.fuel <= 0:
+                meter.refuel()
+        vals = dict(zip(f.f.formals, args))
+        return treeEval(f.f.body, ast.Environment(vals, f.environment))
+    return compiler.apply(f, args)
+
+def checkTreeClosure(f):
+    # the other engines' closures keep a tuple of captured variables,
+    # where the tree engine's keep an environment
+    if isinstance(f.environment, tuple):
+        raise RuntimeError("Cannot apply a closure made by another engine")
+
+def treeEval(exp, rho):
     assert(isinstance(exp,ast.Exp))
     sexp = realEval(exp, rho)
     assert(isinstance(sexp,ast.Sxp))
@@ -164,67 +430,82 @@ def realEval(exp,rho):
 
     elif isinstance(exp, ast.VarExp):
         currEnv = rho
-        while True:
+        while currEnv is not None:
             if exp.name in currEnv.values:
                 return currEnv.values[exp.name]
-            elif currEnv.enclosed == None:
-                currEnv.values[exp.name] = nilValue
-                return nilValue
-            else:
-                currEnv = currEnv.enclosed
+            currEnv = currEnv.enclosed
+        return globalEnv.table.lookup(exp.name)
 
     elif isinstance(exp, ast.ApExp):
         if exp.op == 'if':
-            if isinstance(eval(exp.args[0], rho), ast.NilSxp):
-                return eval(exp.args[2], rho)
+            if isinstance(treeEval(exp.args[0], rho), ast.NilSxp):
+                return treeEval(exp.args[2], rho)
             else:
-                return eval(exp.args[1], rho)
+                return treeEval(exp.args[1], rho)
 
         elif exp.op == 'while':
-            while not (isinstance(eval(exp.args[0], rho), ast.NilSxp)):
-                eval(exp.args[1], rho)
+            meter = globalEnv.meter
+            while not (isinstance(treeEval(exp.args[0], rho), ast.NilSxp)):
+                if meter.limited:
+                    meter.fuel -= 1
+                    if meter.fuel <= 0:
+                        meter.refuel()
+                treeEval(exp.args[1], rho)
             return nilValue
 
         elif exp.op == 'set':
             currEnv = rho
-            val = eval(exp.args[1], rho)
-            while True:
+            val = treeEval(exp.args[1], rho)
+            while currEnv is not None:
                 if exp.args[0] in currEnv.values:
                     currEnv.values[exp.args[0]] = val
                     return val
-                elif currEnv.enclosed == None:
-                    currEnv.values[exp.args[0]] = val
-                    return val
-                else:
-                    currEnv = currEnv.enclosed
+                currEnv = currEnv.enclosed
+            globalEnv.table.assign(exp.args[0], val)
+            return val
+
+        elif exp.op == 'define':
+            globalEnv.table.assign(exp.args[0], treeEval(exp.args[1], rho))
+            return ast.SymSxp(exp.args[0])
 
         elif exp.op == 'begin':
             for i in range(len(exp.args)):
                 if i == len(exp.args) - 1:
-                    return eval(exp.args[i], rho)
-                eval(exp.args[i], rho)
+                    return treeEval(exp.args[i], rho)
+                treeEval(exp.args[i], rho)
 
         else:
-            x = eval(exp.op, rho)
+            x = treeEval(exp.op, rho)
             if isinstance(x, ast.PrimOp):
-                if len(exp.args) == x.nargs:
-                    arglst = []
-                    for i in range(len(exp.args)):
-                        arglst.append(eval(exp.args[i], rho))
-                    methodToCall = getattr(x, 'f')
-                    result = methodToCall(arglst)
-                    return result
+                if len(exp.args) != x.nargs:
+                    raise RuntimeError("Num args don't match in primop " + x.name)
+                if x.f2 is not None:
+                    return x.f2(treeEval(exp.args[0], rho), treeEval(exp.args[1], rho))
+                if x.f1 is not None:
+                    return x.f1(treeEval(exp.args[0], rho))
+                arglst = []
+                for i in range(len(exp.args)):
+                    arglst.append(treeEval(exp.args[i], rho))
+                return x.f(arglst)
 
             elif isinstance(x, ast.Closure):
                 assert(isinstance(x.f, ast.Lambda))
+                checkTreeClosure(x)
                 if len(x.f.formals) == len(exp.args):
+                    meter = globalEnv.meter
+                    if meter.limited:
+                        meter.fuel -= 1
+                        if meter.fuel <= 0:
+                            meter.refuel()
                     vals = {}
                     for i in range(len(exp.args)):
-                        vals[x.f.formals[i]] = eval(exp.args[i], rho)
+                        vals[x.f.formals[i]] = treeEval(exp.args[i], rho)
                     newEnv = ast.Environment(vals, x.environment)
-                    result = eval(x.f.body, newEnv)
+                    result = treeEval(x.f.body, newEnv)
                     return result
                 raise RuntimeError("Num args don't match in closure")
 
+            raise RuntimeError("Cannot apply " + str(x))
+
     else:
         raise RuntimeError("End All")
\ No newline at end of file
@@ -0,0 +1,155 @@
+import os, io, hashlib, pickle
+import schemeast as ast
+import eval
+
+# An image is a snapshot of the global environment: every global that is
+# not an untouched builtin, with the closures, lambdas, captured variables,
+# lists and tables it reaches, written as one pickle so that whatever two
+# globals share, and any cycle among them, is shared in the image too.
+# Loading an image binds all of those globals again in one go, so a
+# program can start from a prelude that was run once instead of running
+# it again every time.
+#
+# Builtin primops are written by name and come back as this process's
+# own, so the optimizer's hints in restored lambdas still hold.  Compiled
+# code is not saved; each lambda is compiled again when it is first
+# called.  The tree engine's closures keep chains of environments where
+# the other engines' keep just their captured variables, so an image made
+# with one of them cannot be loaded by the other.  Like cache files,
+# images are pickles: only load images you trust.
+
+# a hash of the modules whose classes and builtins an image refers to
+interpreterVersion = None
+
+def version():
+    global interpreterVersion
+    if interpreterVersion is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in ('schemeast.py', 'eval.py', 'memo.py', 'vector.py', 'tasks.py', 'image.py'):
+            with open(os.path.join(here, name), 'rb') as fp:
+                h.update(fp.read())
+        interpreterVersion = h.hexdigest()
+    return interpreterVersion
+
+def closureKind():
+    # what the closures the running engine makes look like
+    if eval.globalEnv.engine == 'tree':
+        return 'environments'
+    return 'flat'
+
+def isBuiltin(obj):
+    return isinstance(obj, ast.PrimOp) and eval.builtins.get(obj.name) is obj
+
+def references(obj):
+    # the objects obj refers to that may lead to more lists
+    if isinstance(obj, tuple) or isinstance(obj, list):
+        return obj
+    if isinstance(obj, dict):
+        return list(obj.keys()) + list(obj.values())
+    if not (isinstance(obj, ast.Sxp) or isinstance(obj, ast.Exp) or isinstance(obj, ast.Box)):
+        return ()
+    if isBuiltin(obj):
+        return ()
+    found = []
+    if hasattr(obj, '__dict__'):
+        found.extend(obj.__dict__.values())
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, slot):
+                found.append(getattr(obj, slot))
+    return found
+
+def sharedLists(roots):
+    # the ids of the list cells reachable from roots that more than one
+    # object refers to
+    counts = {}
+    seen = set()
+    pending = list(roots)
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, ast.ListSxp):
+            count = counts.get(id(obj), 0)
+            counts[id(obj)] = count + 1
+            if count == 0:
+                pending.append(obj.carval)
+                pending.append(obj.cdrval)
+        elif id(obj) not in seen:
+            seen.add(id(obj))
+            pending.extend(references(obj))
+    return set([ key for (key, count) in counts.items() if count > 1 ])
+
+class Pickler(pickle.Pickler):
+    def __init__(self, fp, shared):
+        pickle.Pickler.__init__(self, fp, pickle.HIGHEST_PROTOCOL)
+        self.shared = shared
+
+    def persistent_id(self, obj):
+        if isBuiltin(obj):
+            return obj.name
+        return None
+
+    def reducer_override(self, obj):
+        # a list is written as the run of its cars up to a tail that
+        # something else refers to as well, which is written once
+        if type(obj) is not ast.ListSxp:
+            return NotImplemented
+        cars = [obj.carval]
+        cell = obj.cdrval
+        while isinstance(cell, ast.ListSxp) and id(cell) not in self.shared:
+            cars.append(cell.carval)
+            cell = cell.cdrval
+        return (ast.buildList, (cars, cell))
+
+class Unpickler(pickle.Unpickler):
+    def persistent_load(self, name):
+        prim = eval.builtins.get(name)
+        if prim is None:
+            raise pickle.UnpicklingError('no builtin named ' + str(name))
+        return prim
+
+def dumps(table):
+    # the image of the globals in table
+    userGlobals = [ (name, val) for (name, val) in table.items()
+        if eval.builtins.get(name) is not val ]
+    out = io.BytesIO()
+    try:
+        Pickler(out, sharedLists([ val for (name, val) in userGlobals ])).dump(
+            {'key': version(), 'closures': closureKind(), 'globals': userGlobals})
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as err:
+        raise RuntimeError('Cannot save image: ' + str(err))
+    return out.getvalue()
+
+def loads(data, table):
+    # bind the globals of the image data in table
+    try:
+        saved = Unpickler(io.BytesIO(data)).load()
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError,
+            IndexError, TypeError, ValueError) as err:
+        raise RuntimeError('Cannot load image: ' + str(err))
+    if not isinstance(saved, dict) or saved.get('key') != version():
+        raise RuntimeError('Cannot load image: made by a different interpreter')
+    if saved['closures'] != closureKind():
+        raise RuntimeError('Cannot load image: made with the tree engine'
+            if saved['closures'] == 'environments' else
+            'Cannot load image: the tree engine cannot load images made with another engine')
+    for (name, val) in saved['globals']:
+        table.assign(name, val)
+
+def save(path, table):
+    data = dumps(table)
+    try:
+        with open(path, 'wb') as fp:
+            fp.write(data)
+    except OSError as err:
+        raise RuntimeError('Cannot save image: ' + str(err))
+
+def read(path):
+    try:
+        with open(path, 'rb') as fp:
+            return fp.read()
+    except OSError as err:
+        raise RuntimeError('Cannot load image: ' + str(err))
+
+def load(path, table):
+    loads(read(path), table)
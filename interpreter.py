@@ -0,0 +1,118 @@
+import io, threading, contextlib
+import parse, eval, scheme, image, budget, profiler
+
+# An Interpreter is one Scheme interpreter among any number in the same
+# process: it has its own globals, starting from the builtins (which all
+# interpreters share and none can change), its own engine and optimizer
+# setting, its own stream for print, its own tasks and its own profile.
+# The evaluator finds all of these through eval.globalEnv, which is per
+# thread, so an interpreter puts its state there while it runs and puts
+# back what was there when it is done.  An interpreter can be used from
+# any thread, and from inside another one's primops; it runs in one
+# thread at a time, and a thread that wants it while it is busy waits
+# its turn.  A closure handed from one interpreter to another runs on
+# the engine of the one that calls it and sees that one's globals;
+# closures of the tree engine and of the others cannot be mixed.
+# maxSteps, maxCells and timeLimit bound each input it runs and each
+# call (see budget.py).
+#
+#   interp = Interpreter(engine='vm')
+#   interp.evalString('(define (sq x) (* x x))')
+#   interp.call('sq', schemeast.makeNum(12))     # NumSxp(144)
+
+class Interpreter:
+    def __init__(self, engine='compile', optimizing=True, output=None,
+            maxSteps=None, maxCells=None, timeLimit=None):
+        if engine not in eval.engines:
+            raise ValueError('unknown engine: ' + str(engine))
+        self.table = eval.Globals(eval.builtins)
+        self.engine = engine
+        self.optimizing = optimizing
+
+        # where print writes; None means sys.stdout
+        self.output = output
+
+        self.meter = budget.Meter(maxSteps, maxCells, timeLimit)
+        self.profile = profiler.Profile()
+        self.scheduler = None
+        self.lock = threading.RLock()
+        self.depth = 0
+
+    @contextlib.contextmanager
+    def active(self):
+        # run the body of the with statement in this interpreter
+        with self.lock:
+            if self.depth > 0:
+                # already active in this thread
+                yield self
+                return
+            env = eval.globalEnv
+            saved = (env.table, env.engine, env.optimizing, env.output,
+                env.scheduler, env.meter, env.profile)
+            env.table, env.engine, env.optimizing = self.table, self.engine, self.optimizing
+            env.output, env.scheduler = self.output, self.scheduler
+            env.meter, env.profile = self.meter, self.profile
+            self.depth += 1
+            try:
+                yield self
+            finally:
+                self.depth -= 1
+                self.scheduler = env.scheduler
+                (env.table, env.engine, env.optimizing, env.output,
+                    env.scheduler, env.meter, env.profile) = saved
+
+    def evalString(self, text):
+        # run every input in text, read as the lines of a source file
+        # are, and return the value of the last one (nil if there are
+        # none); a syntax or run-time error is raised as a RuntimeError,
+        # and the inputs before it keep their effects
+        tokenizer = parse.TokenizingReader(io.StringIO(text), None)
+        return self.runInputs(scheme.readInputs(tokenizer))
+
+    def evalFile(self, path):
+        # like evalString on the contents of the file path, whose parsed
+        # inputs are cached as the REPL caches them
+        return self.runInputs(scheme.fileInputs(path, None))
+
+    def runInputs(self, inputs):
+        val = eval.nilValue
+        with self.active():
+            for (elt, message, line) in inputs:
+                if message is not None:
+                    raise RuntimeError(message)
+                try:
+                    val = eval.eval(elt)
+                except RuntimeError as err:
+                    raise type(err)('{} (on input that started on line {})'.format(err, line))
+        return val
+
+    def call(self, f, *args):
+        # apply f, a closure or primop or the name of a global holding
+        # one, to args, which are Sxps
+        with self.active():
+            if isinstance(f, str):
+                f = self.table.lookup(f)
+            if self.depth == 1:
+                self.meter.start()
+            try:
+                val = eval.apply(f, list(args))
+                if eval.globalEnv.scheduler is not None:
+                    eval.globalEnv.scheduler.runAll()
+            except RecursionError:
+                raise eval.tooDeep()
+            return val
+
+    def loadImage(self, path):
+        with self.active():
+            image.load(path, self.table)
+
+    def saveImage(self, path):
+        with self.active():
+            image.save(path, self.table)
+
+    def close(self):
+        # stop this interpreter's tasks and its event loop
+        with self.lock:
+            if self.scheduler is not None:
+                self.scheduler.close()
+                self.scheduler = None
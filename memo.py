@@ -0,0 +1,58 @@
+import collections
+import schemeast as ast
+import eval
+
+# A memoized closure is a primop that calls the closure it wraps the
+# first time it sees a list of arguments and remembers the result.
+# Arguments are told apart by their structure (see ast.hashKey), so two
+# equal lists hit the same entry; an argument that cannot be hashed, a
+# closure say, is an error.  Only the most recently used entries are
+# kept, up to limit of them.
+#
+# The cek and vm engines look entries up and remember results themselves
+# with find() and remember(), running the closure on their own stacks, so
+# memoized recursion is as deep there as any other; the other engines
+# call the primop.
+
+# how many entries memoize keeps when it is not given a limit
+defaultLimit = 10000
+
+class Memo(ast.PrimOp):
+    __slots__ = ('closure', 'limit', 'entries', 'hits', 'misses')
+
+    def __init__(self, closure, limit):
+        ast.PrimOp.__init__(self, 'memoized', self.call, len(closure.f.formals))
+        self.closure = closure
+        self.limit = limit
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, args):
+        key, val = self.find(args)
+        if val is None:
+            val = eval.apply(self.closure, args)
+            self.remember(key, val)
+        return val
+
+    def find(self, args):
+        # the key for args and the result remembered for it, or None
+        key = tuple([ ast.hashKey(arg) for arg in args ])
+        val = self.entries.get(key)
+        if val is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return (key, val)
+
+    def remember(self, key, val):
+        self.entries[key] = val
+        if len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+
+    def __str__(self):
+        return '<memoized closure>'
+
+    def __repr__(self):
+        return 'Memo(' + repr(self.closure) + ', ' + repr(self.limit) + ')'
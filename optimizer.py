@@ -0,0 +1,140 @@
+import schemeast as ast
+import eval
+
+# The optimizer rewrites each input before it runs.  An if whose test is
+# a constant becomes the branch it would take, a while whose test is nil
+# becomes nil, and a begin nested in a begin is spliced into it, dropping
+# constants and lambdas whose values would be thrown away.
+#
+# Everything else it finds is left as a hint for the engines, because a
+# program may rebind a builtin with set or define at any time.  A global
+# reference to a builtin that no lambda shadows gets the builtin in its
+# `builtin` field, and an application of a side-effect free builtin to
+# constants (or to applications folded the same way) gets its value,
+# together with the builtins it relied on, in `folded`.  An engine may
+# use a hint only while every builtin it names is still bound to its
+# name; see holds().
+
+# builtins that only compute a value, so they can be run ahead of time
+foldable = ('+', '-', '*', '/', '<', '>', '=', 'car', 'cdr',
+    'number?', 'symbol?', 'list?', 'null?', 'primop?', 'closure?', 'table?',
+    'vector?')
+
+def optimize(exp, changes=None):
+    # the optimized exp; changes, if given, is a list that gets a
+    # description of each change
+    called = {}
+    exp = optimizeExp(exp, (), changes, called)
+    if changes is not None:
+        for name in called:
+            changes.append('calls builtin {} directly'.format(name))
+    return exp
+
+def holds(guards, table):
+    # whether every (name, builtin) in guards is still bound in the
+    # table of globals
+    for (name, prim) in guards:
+        if table.get(name) is not prim:
+            return False
+    return True
+
+def builtinNamed(name, scopes):
+    for scope in scopes:
+        if name in scope:
+            return None
+    prim = eval.builtins.get(name)
+    if prim is not None and eval.globalEnv.table.get(name) is prim:
+        return prim
+    return None
+
+def optimizeExp(exp, scopes, changes, called):
+    if isinstance(exp, ast.ValExp):
+        return exp
+
+    elif isinstance(exp, ast.Lambda):
+        exp.body = optimizeExp(exp.body, (set(exp.formals),) + scopes, changes, called)
+        return exp
+
+    elif isinstance(exp, ast.VarExp):
+        exp.builtin = builtinNamed(exp.name, scopes)
+        return exp
+
+    if exp.op == 'set' or exp.op == 'define':
+        exp.args[1] = optimizeExp(exp.args[1], scopes, changes, called)
+        return exp
+
+    # optimizing an input twice changes and reports nothing the second
+    # time, so only count builtins not already marked
+    marked = isinstance(exp.op, ast.VarExp) and exp.op.builtin is not None
+    if isinstance(exp.op, ast.Exp):
+        exp.op = optimizeExp(exp.op, scopes, changes, called)
+    exp.args = [ optimizeExp(elt, scopes, changes, called) for elt in exp.args ]
+
+    if exp.op == 'if':
+        test = exp.args[0]
+        if isinstance(test, ast.ValExp):
+            taken = exp.args[2] if test.sxp is eval.nilValue else exp.args[1]
+            note(changes, 'pruned {} to {}', exp, taken)
+            return taken
+
+    elif exp.op == 'while':
+        test = exp.args[0]
+        if isinstance(test, ast.ValExp) and test.sxp is eval.nilValue:
+            note(changes, 'removed {}', exp)
+            return ast.ValExp(eval.nilValue)
+
+    elif exp.op == 'begin':
+        return flatten(exp, changes)
+
+    elif isinstance(exp.op, ast.VarExp) and exp.op.builtin is not None:
+        prim = exp.op.builtin
+        if prim.nargs == len(exp.args):
+            if not marked:
+                called[prim.name] = True
+            if exp.op.name in foldable and exp.folded is None:
+                fold(exp, changes)
+    return exp
+
+def flatten(exp, changes):
+    # splice nested begins into this one and drop values nobody sees
+    body = []
+    for elt in exp.args:
+        if isinstance(elt, ast.ApExp) and elt.op == 'begin':
+            note(changes, 'flattened {}', elt)
+            body.extend(elt.args)
+        else:
+            body.append(elt)
+    kept = []
+    for elt in body[:-1]:
+        if isinstance(elt, ast.ValExp) or isinstance(elt, ast.Lambda):
+            note(changes, 'dropped unused {}', elt)
+        else:
+            kept.append(elt)
+    kept.append(body[-1])
+    if len(kept) == 1:
+        return kept[0]
+    exp.args = kept
+    return exp
+
+def fold(exp, changes):
+    guards = {exp.op.name: exp.op.builtin}
+    vals = []
+    for elt in exp.args:
+        if isinstance(elt, ast.ValExp):
+            vals.append(elt.sxp)
+        elif isinstance(elt, ast.ApExp) and elt.folded is not None:
+            vals.append(elt.folded[0])
+            guards.update(elt.folded[1])
+        else:
+            return
+    try:
+        value = exp.op.builtin.f(vals)
+    except RuntimeError:
+        # leave it to fail when it runs
+        return
+    exp.folded = (value, tuple(guards.items()))
+    note(changes, 'folded {} to {}', exp, value)
+
+def note(changes, message, *parts):
+    if changes is not None:
+        changes.append(message.format(*parts))
@@ -1,11 +1,19 @@
-import ast
-import eval
+import re
+import schemeast as ast
+
+# whitespace other than newlines, then an optional comment running up
+# to the end of the line
+skipPattern = re.compile(r'[^\S\n]*(?:;[^\n]*)?')
+
+# the rest of a name after its first character
+namePattern = re.compile(r'[^\s();]*')
 
 class TokenizingReader:
     def __init__(self, cin, cout):
         self.cin = cin
         self.cout = cout
         self.line = ''
+        self.pos = 0
         self.lineNumber = 0
         self.continuePrompt(False)
 
@@ -16,50 +24,60 @@ class TokenizingReader:
             self.prompt = '--> '
 
     def get(self):
-        # read a line if our buffer is empty
-        if self.line == '':
+        # read a line if our buffer is empty; the line is scanned in place
+        # by moving self.pos along it, never by slicing off what was read
+        if self.pos >= len(self.line):
             if self.cout is not None:
                 self.cout.write(self.prompt)
                 self.cout.flush()
             self.line = self.cin.readline()
             if self.line != '' and self.line[-1] != '\n':
                 self.line = self.line + '\n'
-            self.lineLen = len(self.line)
+            self.pos = 0
             self.lineNumber += 1
 
         # end of file?
         if self.line == '':
             return (None, self.lineNumber, 0)
 
-        # skip whitespace (except newlines)
-        while self.line[0] != '\n' and self.line[0].isspace():
-            self.line = self.line[1:]
-
-        # skip comments
-        if self.line[0] == ';':
-            self.line = self.line[-1:]
+        # skip whitespace (except newlines) and comments
+        line = self.line
+        i = skipPattern.match(line, self.pos).end()
 
         # end of line, parentheses, or quote?
-        if self.line[0] in "()\n'":
-            v = (self.line[0], self.lineNumber, self.lineLen-len(self.line)+1)
-            self.line = self.line[1:]
-            return v
+        if line[i] in "()\n'":
+            self.pos = i + 1
+            return (line[i], self.lineNumber, i + 1)
 
         # scan a name
-        i = 1
-        while i < len(self.line) and not self.line[i].isspace() and self.line[i] not in '();':
-            i += 1
-        v = (self.line[:i], self.lineNumber, self.lineLen-len(self.line)+1)
-        self.line = self.line[i:]
-        return v
+        j = namePattern.match(line, i + 1).end()
+        self.pos = j
+        return (line[i:j], self.lineNumber, i + 1)
+
+# The parser is a recursive descent over the grammar's ordered
+# alternatives.  Rather than trying every production in turn, expression
+# looks at the token after '(' and only tries the special form that
+# token names before falling back to a plain application.  A special form
+# that fails part way (say an if with two arguments) falls back to an
+# application of that name over the same tokens, so the results of
+# expression are memoized by position and nothing is parsed twice;
+# parsing is linear in the number of tokens.
 
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
+        self.expressions = {}
 
     def input(self, i):
         if i < 0: return (None, -1)
 
+        # definition, which only comes at the top level
+        (keyword, j) = self.raw(i+1)
+        if keyword == 'define':
+            (definition, j) = self.defineForm(i)
+            if j >= 0:
+                return (definition, j)
+
         # expression
         (expression, j) = self.expression(i)
         if j >= 0:
@@ -70,17 +88,57 @@ class Parser:
     def expression(self, i):
         if i < 0: return (None, -1)
 
-        # value
-        value, j = self.value(i)
-        if j >= 0:
-            return (value, j)
+        if i not in self.expressions:
+            self.expressions[i] = self.predictExpression(i)
+        return self.expressions[i]
 
-        # variable
-        variable, j = self.variable(i)
-        if j >= 0:
-            v = ast.VarExp(variable)
-            return (v, j)
+    def predictExpression(self, i):
+        (v, j) = self.raw(i)
+        if j < 0:
+            return (None, -1)
+
+        if v != '(':
+            # value
+            value, j = self.value(i)
+            if j >= 0:
+                return (value, j)
+
+            # variable
+            variable, j = self.variable(i)
+            if j >= 0:
+                v = ast.VarExp(variable)
+                return (v, j)
+
+            return (None, -1)
+
+        (keyword, j) = self.raw(i+1)
+        if keyword == 'lambda':
+            value, j = self.value(i)
+            if j >= 0:
+                return (value, j)
+        elif keyword == 'if':
+            elt, j = self.ifForm(i)
+            if j >= 0:
+                return (elt, j)
+        elif keyword == 'while':
+            elt, j = self.whileForm(i)
+            if j >= 0:
+                return (elt, j)
+        elif keyword == 'set':
+            elt, j = self.setForm(i)
+            if j >= 0:
+                return (elt, j)
+        elif keyword == 'begin':
+            elt, j = self.beginForm(i)
+            if j >= 0:
+                return (elt, j)
+        elif keyword == 'define':
+            # definitions are only allowed at the top level (see input)
+            return (None, -1)
 
+        return self.application(i)
+
+    def ifForm(self, i):
         # ( if expression expression expression )
         j = self.mustBe('(', i)
         j = self.mustBe('if', j)
@@ -92,6 +150,9 @@ class Parser:
             elt = ast.ApExp('if', [e1, e2, e3])
             return (elt, j)
 
+        return (None, -1)
+
+    def whileForm(self, i):
         # ( while expression expression )
         j = self.mustBe('(', i)
         j = self.mustBe('while', j)
@@ -102,6 +163,9 @@ class Parser:
             elt = ast.ApExp('while', [e1, e2])
             return (elt, j)
 
+        return (None, -1)
+
+    def setForm(self, i):
         # ( set variable expression )
         j = self.mustBe('(', i)
         j = self.mustBe('set', j)
@@ -109,9 +173,41 @@ class Parser:
         (e1, j) = self.expression(j)
         j = self.mustBe(')', j)
         if j >= 0:
+            if isinstance(e1, ast.Lambda) and e1.name is None:
+                e1.name = variable
             elt = ast.ApExp('set', [variable, e1])
             return (elt, j)
 
+        return (None, -1)
+
+    def defineForm(self, i):
+        # ( define variable expression )
+        j = self.mustBe('(', i)
+        j = self.mustBe('define', j)
+        (variable, k) = self.variable(j)
+        if k >= 0:
+            (e1, k) = self.expression(k)
+        else:
+            # ( define ( variable variable* ) expression ), which defines
+            # variable as a lambda
+            (names, k) = self.argList(j)
+            if k >= 0 and len(names) > 0:
+                (body, k) = self.expression(k)
+                e1 = ast.Lambda(names[1:], body)
+                e1.line, e1.column = self.tokens[i][1], self.tokens[i][2]
+                variable = names[0]
+            else:
+                k = -1
+        k = self.mustBe(')', k)
+        if k >= 0:
+            if isinstance(e1, ast.Lambda) and e1.name is None:
+                e1.name = variable
+            elt = ast.ApExp('define', [variable, e1])
+            return (elt, k)
+
+        return (None, -1)
+
+    def beginForm(self, i):
         # ( begin expression+ )
         j = self.mustBe('(', i)
         j = self.mustBe('begin', j)
@@ -128,6 +224,9 @@ class Parser:
             elt = ast.ApExp('begin', elist)
             return (elt, j)
 
+        return (None, -1)
+
+    def application(self, i):
         # ( expression+ )
         j = self.mustBe('(', i)
         elist = []
@@ -166,6 +265,7 @@ class Parser:
         j = self.mustBe(')', j)
         if j >= 0:
             f = ast.Lambda(argList, expression)
+            f.line, f.column = self.tokens[i][1], self.tokens[i][2]
             return (f, j)
 
         return (None, -1)
@@ -226,7 +326,7 @@ class Parser:
         j = self.mustBe(')', j)
         if j >= 0:
             # form a linked list
-            tail = eval.nilValue
+            tail = ast.nil
             for elt in slist[::-1]:
                 tail = ast.ListSxp(elt, tail)
             return (tail, j)
@@ -262,7 +362,7 @@ class Parser:
             if  (len(v) > 0 and v.isdigit()) or \
                 (len(v) > 1 and v[0] == '-' and v[1:].isdigit()):
                 n = int(v)
-                return (ast.NumSxp(n), j)
+                return (ast.makeNum(n), j)
 
         return (None, -1)
 
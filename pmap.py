@@ -0,0 +1,64 @@
+import os, pickle, threading, multiprocessing
+import eval
+import budget
+
+# pmap applies a function to every element of a list in a pool of worker
+# processes and returns the results as a list in the original order.
+# The function, together with the frames it captured and every global
+# that is not an untouched builtin, is pickled once and handed to each
+# worker as it starts; the worker loads it into its own interpreter, whose
+# builtins are the same eval.fxns.  Elements are sent in chunks and their
+# results pickled back, so both must be plain values (see ast.hashKey).
+# Globals a worker sets are not seen by the caller.  Each worker gets what
+# is left of the caller's budget (see budget.py) for all it does.
+
+# how many worker processes to start; None means one per core
+workers = None
+
+# the function a worker applies, loaded by initWorker
+function = None
+
+def initWorker(payload):
+    global function
+    (engine, userGlobals, function, shared) = pickle.loads(payload)
+    eval.globalEnv.engine = engine
+    for (name, val) in userGlobals.items():
+        eval.globalEnv.table.assign(name, val)
+    eval.globalEnv.meter = budget.resumed(shared)
+
+def callOne(item):
+    try:
+        return eval.apply(function, [item])
+    except RecursionError:
+        raise eval.tooDeep()
+
+def pmap(f, items):
+    count = workers or os.cpu_count() or 1
+    if count == 1 or len(items) < 2:
+        return [ eval.apply(f, [item]) for item in items ]
+
+    userGlobals = {}
+    for (name, val) in eval.globalEnv.table.items():
+        if eval.builtins.get(name) is not val:
+            userGlobals[name] = val
+    try:
+        payload = pickle.dumps((eval.globalEnv.engine, userGlobals, f,
+            eval.globalEnv.meter.share()), pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as err:
+        raise RuntimeError("pmap cannot send its function to workers: " + str(err))
+
+    # fork where the platform has it: workers start quickly and import
+    # this interpreter's modules rather than finding them again on the
+    # path.  A process with other threads, a server say, cannot fork
+    # safely, as the child could wait forever on a lock one of them held,
+    # so it starts workers from a fork server instead
+    methods = multiprocessing.get_all_start_methods()
+    if threading.active_count() > 1 and 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+    elif threading.active_count() == 1 and 'fork' in methods:
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    chunk = max(1, len(items) // (count * 4))
+    with context.Pool(count, initWorker, (payload,)) as pool:
+        return pool.map(callOne, items, chunk)
@@ -0,0 +1,150 @@
+import sys, time
+import schemeast as ast
+import compiler
+
+# A profiler for Scheme functions run by the compile engine.  While it
+# is on, every call from compiled code goes through Profile.call() below,
+# which keeps per-function counts of calls, inclusive and exclusive time
+# and allocations, plus a tree of call stacks for flame graphs.  While it
+# is off, a call costs compiled code one test of switch[0].
+#
+# Closures are counted per lambda, named by the variable they were first
+# set to and by where the lambda starts in the source.  Allocations are
+# the Scheme objects a function makes itself: a frame for each call of a
+# closure, each closure it creates, and each new cons cell or number a
+# primop returns to it.
+#
+# Each thread has a Profile of its own in eval.globalEnv.profile, and an
+# Interpreter puts its own there while it runs, so what one interpreter
+# profiles is never mixed up with another's.
+
+class Entry:
+    __slots__ = ('label', 'calls', 'inclusive', 'exclusive', 'allocations', 'active')
+
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.allocations = 0
+
+        # how many calls of this function are running, so recursive
+        # calls only count towards inclusive time once
+        self.active = 0
+
+class StackNode:
+    # one call path in the tree of call stacks, with the exclusive time
+    # spent at the end of that path
+    __slots__ = ('label', 'children', 'time')
+
+    def __init__(self, label):
+        self.label = label
+        self.children = {}
+        self.time = 0.0
+
+    def child(self, label):
+        node = self.children.get(label)
+        if node is None:
+            node = self.children[label] = StackNode(label)
+        return node
+
+def label(f):
+    if isinstance(f, ast.PrimOp):
+        return f.name
+    lam = f.f
+    return '{} ({}:{})'.format(lam.name or 'lambda', lam.line, lam.column)
+
+class Profile:
+    def __init__(self):
+        # on or off, as a one-element list so compiled code can keep hold
+        # of it
+        self.switch = [False]
+
+        self.top = Entry('<top level>')
+        self.stats = {}
+        self.root = StackNode(None)
+
+        # the calls running now: [entry, time spent in callees, stack node]
+        self.running = []
+
+    def start(self):
+        self.switch[0] = True
+
+    def stop(self):
+        self.switch[0] = False
+
+    def reset(self):
+        self.stats.clear()
+        self.top.allocations = 0
+        self.root = StackNode(None)
+
+    def entryFor(self, f):
+        key = f.f if isinstance(f, ast.Closure) else f
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = Entry(label(f))
+        return entry
+
+    def allocated(self, n):
+        if self.running:
+            self.running[-1][0].allocations += n
+        else:
+            self.top.allocations += n
+
+    def call(self, f, args):
+        if not isinstance(f, (ast.Closure, ast.PrimOp)):
+            return compiler.apply(f, args)
+
+        running = self.running
+        entry = self.entryFor(f)
+        entry.calls += 1
+        entry.active += 1
+        parent = running[-1][2] if running else self.root
+        record = [entry, 0.0, parent.child(entry.label)]
+        running.append(record)
+        began = time.perf_counter()
+        try:
+            if isinstance(f, ast.Closure):
+                entry.allocations += 1
+                return compiler.apply(f, args)
+            result = f.f(args) if f.nargs == len(args) else compiler.apply(f, args)
+            if isinstance(result, ast.ListSxp) or isinstance(result, ast.NumSxp) \
+                    and not ast.smallNumLow <= result.number < ast.smallNumHigh:
+                entry.allocations += 1
+            return result
+        finally:
+            elapsed = time.perf_counter() - began
+            running.pop()
+            entry.active -= 1
+            if entry.active == 0:
+                entry.inclusive += elapsed
+            entry.exclusive += elapsed - record[1]
+            record[2].time += elapsed - record[1]
+            if running:
+                running[-1][1] += elapsed
+
+    def report(self, out=None):
+        # a table of every function called, the most exclusive time first
+        if out is None:
+            out = sys.stdout
+        entries = sorted(self.stats.values(), key=lambda e: e.exclusive, reverse=True)
+        out.write('{:>10} {:>10} {:>10} {:>10}  {}\n'.format(
+            'calls', 'total s', 'self s', 'allocs', 'function'))
+        for e in entries:
+            out.write('{:>10} {:>10.4f} {:>10.4f} {:>10}  {}\n'.format(
+                e.calls, e.inclusive, e.exclusive, e.allocations, e.label))
+        if self.top.allocations:
+            out.write('{:>10} {:>10} {:>10} {:>10}  {}\n'.format(
+                '', '', '', self.top.allocations, self.top.label))
+
+    def writeStacks(self, out):
+        # collapsed stacks, one "outer;...;inner microseconds" line per
+        # call path, as flame graph tools expect
+        pending = [ (node, (node.label,)) for node in self.root.children.values() ]
+        while pending:
+            node, path = pending.pop()
+            micros = int(node.time * 1e6)
+            if micros > 0:
+                out.write(';'.join(path) + ' ' + str(micros) + '\n')
+            for child in node.children.values():
+                pending.append((child, path + (child.label,)))
@@ -0,0 +1,111 @@
+import schemeast as ast
+
+# The resolver gives every variable reference and every set an address,
+# and every lambda the list of variables its closures capture.
+#
+# Closures are flat: rather than the whole chain of frames around it, a
+# closure keeps just the values of the variables its body uses from
+# enclosing lambdas, so holding on to a closure keeps nothing else of
+# those frames alive.  An address is (0, slot) for a formal of the
+# innermost lambda, in its frame, and (1, index) for a captured
+# variable, in the closure; names no enclosing lambda binds are globals
+# and get the address None.  Lambda.free lists, for each captured
+# variable, its address where the closure is made.
+#
+# A variable that is both captured and assigned with set lives in an
+# ast.Box, which is what gets captured, so every closure and the frame
+# that binds it see the same variable.  References to it have `boxed`
+# set, and the lambda that binds it lists its slot in `boxes`, for the
+# engines to box the argument when the lambda is called.
+
+class Binding:
+    # one formal of one lambda, and how it is used
+    __slots__ = ('assigned', 'captured')
+
+    def __init__(self):
+        self.assigned = False
+        self.captured = False
+
+class Scope:
+    def __init__(self, lam, enclosing):
+        self.enclosing = enclosing
+        self.slots = {}
+        self.bindings = []
+        for name in lam.formals:
+            self.slots[name] = len(self.bindings)
+            self.bindings.append(Binding())
+
+        # captured names, and for each its index, address in the
+        # enclosing scope and binding
+        self.free = {}
+        self.captures = []
+        self.captured = []
+
+def resolve(exp):
+    uses = []
+    resolveExp(exp, None, uses)
+
+    # now it is known which variables need boxes
+    for (node, binding) in uses:
+        if isinstance(node, ast.Lambda):
+            node.boxes = [ slot for slot in range(len(binding)) if needsBox(binding[slot]) ]
+        else:
+            node.boxed = needsBox(binding)
+
+def needsBox(binding):
+    return binding.assigned and binding.captured
+
+def resolveExp(exp, scope, uses):
+    if isinstance(exp, ast.ValExp):
+        return
+
+    elif isinstance(exp, ast.Lambda):
+        inner = Scope(exp, scope)
+        resolveExp(exp.body, inner, uses)
+        exp.free = inner.captures
+        uses.append((exp, inner.bindings))
+
+    elif isinstance(exp, ast.VarExp):
+        exp.address, binding = lookup(exp.name, scope)
+        exp.boxed = False
+        if binding is not None:
+            uses.append((exp, binding))
+
+    elif isinstance(exp, ast.ApExp):
+        if exp.op == 'set':
+            exp.address, binding = lookup(exp.args[0], scope)
+            exp.boxed = False
+            if binding is not None:
+                binding.assigned = True
+                uses.append((exp, binding))
+            resolveExp(exp.args[1], scope, uses)
+            return
+        if exp.op == 'define':
+            # only ever at the top level, so always a global
+            exp.address = None
+            resolveExp(exp.args[1], scope, uses)
+            return
+        if isinstance(exp.op, ast.Exp):
+            resolveExp(exp.op, scope, uses)
+        for elt in exp.args:
+            resolveExp(elt, scope, uses)
+
+def lookup(name, scope):
+    # (address, binding) of name in scope, capturing it from enclosing
+    # scopes as needed; (None, None) for a global
+    if scope is None:
+        return (None, None)
+    if name in scope.slots:
+        slot = scope.slots[name]
+        return ((0, slot), scope.bindings[slot])
+    if name in scope.free:
+        index = scope.free[name]
+        return ((1, index), scope.captured[index])
+    address, binding = lookup(name, scope.enclosing)
+    if binding is None:
+        return (None, None)
+    binding.captured = True
+    index = scope.free[name] = len(scope.captures)
+    scope.captures.append(address)
+    scope.captured.append(binding)
+    return ((1, index), binding)
@@ -1,57 +1,243 @@
 #!/usr/bin/env python3
 
-import sys
-import ast, parse, eval
+import sys, io, argparse, pickle
+import parse, eval, vm, cache, optimizer, image, budget
+import schemeast as ast
+
+# print each input's bytecode before running it
+disassemble = False
+
+# write what the optimizer changed in each input to stderr
+reportOptimizations = False
+
+# how deep into nested lists and how far along a list the REPL shows a
+# result; None for all of it
+printDepth = None
+printLength = None
+
+# size of the buffer print writes through in batch mode
+batchBufferSize = 1 << 20
 
 def main():
-    print('Scheme interpreter')
-    print('October 2017 version')
+    argParser = argparse.ArgumentParser(description='Scheme interpreter')
+    argParser.add_argument('source', nargs='?', default='',
+        help='file to run before reading from stdin')
+    argParser.add_argument('--engine', choices=eval.engines,
+        default=eval.globalEnv.engine, help='evaluator to run each input with')
+    argParser.add_argument('--dis', action='store_true',
+        help='print the bytecode of each input before running it')
+    argParser.add_argument('--cache-dir', metavar='DIR',
+        help='keep parsed source files here instead of next to them')
+    argParser.add_argument('--no-cache', action='store_true',
+        help='always parse the source file')
+    argParser.add_argument('--batch', action='store_true',
+        help='run the source file without prompts or echoed results, '
+             'then exit; the exit status is 1 if an input failed')
+    argParser.add_argument('--profile', action='store_true',
+        help='profile Scheme functions and print a report to stderr at exit')
+    argParser.add_argument('--profile-stacks', metavar='FILE',
+        help='profile, and write collapsed call stacks for flame graphs to FILE')
+    argParser.add_argument('--serve', metavar='ADDRESS',
+        help='serve REPL sessions on ADDRESS, [HOST:]PORT or the path of a '
+             'Unix socket, running the source file at the start of each')
+    argParser.add_argument('--no-optimize', action='store_true',
+        help='run inputs as written, without the optimizer')
+    argParser.add_argument('--optimize-report', action='store_true',
+        help='write what the optimizer changed in each input to stderr')
+    argParser.add_argument('--print-depth', type=int, metavar='N',
+        help='show lists nested more than N deep in results as (...)')
+    argParser.add_argument('--print-length', type=int, metavar='N',
+        help='show only the first N elements of lists in results')
+    argParser.add_argument('--image', metavar='FILE',
+        help='start from the globals saved in the image FILE')
+    argParser.add_argument('--save-image', metavar='FILE',
+        help='save the globals to the image FILE when done')
+    argParser.add_argument('--max-steps', type=int, metavar='N',
+        help='stop an input that makes more than N closure calls and '
+             'while loop turns')
+    argParser.add_argument('--max-cells', type=int, metavar='N',
+        help='stop an input that allocates more than N list cells and '
+             'vector elements')
+    argParser.add_argument('--time-limit', type=float, metavar='SECONDS',
+        help='stop an input that runs for more than SECONDS')
+    args = argParser.parse_args()
+    eval.globalEnv.engine = args.engine
+    if (args.profile or args.profile_stacks) and args.engine != 'compile':
+        argParser.error('profiling needs the compile engine')
+    cache.directory = args.cache_dir
+    cache.enabled = not args.no_cache
+    eval.globalEnv.optimizing = not args.no_optimize
+    global disassemble, reportOptimizations, printDepth, printLength
+    disassemble = args.dis
+    reportOptimizations = args.optimize_report
+    printDepth = args.print_depth
+    printLength = args.print_length
 
-    if len(sys.argv) == 2:
-        repl(sys.argv[1])
-    else:
-        repl('')
+    if args.batch and args.source == '':
+        argParser.error('--batch needs a source file')
+    if args.batch and args.serve:
+        argParser.error('--batch and --serve cannot be used together')
+    if args.save_image and args.serve:
+        argParser.error('--save-image and --serve cannot be used together')
+    for (flag, limit) in (('--max-steps', args.max_steps), ('--max-cells', args.max_cells),
+            ('--time-limit', args.time_limit)):
+        if limit is not None and limit <= 0:
+            argParser.error(flag + ' must be positive')
+    eval.globalEnv.meter = budget.Meter(args.max_steps, args.max_cells, args.time_limit)
+
+    imageData = None
+    if args.image:
+        try:
+            imageData = image.read(args.image)
+            image.loads(imageData, eval.globalEnv.table)
+        except RuntimeError as err:
+            argParser.error(str(err))
+
+    status = 0
+    if args.profile or args.profile_stacks:
+        eval.globalEnv.profile.start()
+    try:
+        if args.batch:
+            status = batch(args.source)
+        elif args.serve:
+            import server
+            try:
+                server.parseAddress(args.serve)
+            except ValueError as err:
+                argParser.error(str(err))
+            server.serve(args.serve, args.source, imageData)
+        else:
+            print('Scheme interpreter')
+            print('October 2017 version')
+            repl(args.source)
+        if args.save_image and status == 0:
+            try:
+                image.save(args.save_image, eval.globalEnv.table)
+            except RuntimeError as err:
+                sys.stderr.write(str(err) + '\n')
+                status = 1
+    finally:
+        if args.profile:
+            eval.globalEnv.profile.report(sys.stderr)
+        if args.profile_stacks:
+            with open(args.profile_stacks, 'w') as fp:
+                eval.globalEnv.profile.writeStacks(fp)
+    sys.exit(status)
 
 def repl(source):
-    fp = None
     if source != '':
-        fp = open(source)
-        tokenizer = parse.TokenizingReader(fp, sys.stdout)
-    else:
-        tokenizer = parse.TokenizingReader(sys.stdin, sys.stdout)
+        for (elt, message, line) in fileInputs(source, sys.stdout):
+            runInput(elt, message, line)
 
+    tokenizer = parse.TokenizingReader(sys.stdin, sys.stdout)
+    for (elt, message, line) in readInputs(tokenizer):
+        runInput(elt, message, line)
+
+    # end of file means quitting time
+    print()
+
+def batch(source):
+    # run source without prompts or echoing results, stopping at the
+    # first error; returns the exit status
+    eval.globalEnv.output = open(sys.stdout.fileno(), 'w', buffering=batchBufferSize,
+        closefd=False)
+    try:
+        for (elt, message, line) in fileInputs(source, None):
+            if message is not None:
+                sys.stderr.write(message + '\n')
+                return 1
+            try:
+                elt = prepare(elt, line, sys.stderr)
+                eval.eval(elt)
+            except RuntimeError as err:
+                sys.stderr.write('{} (on input that started on line {})\n'.format(err, line))
+                return 1
+        return 0
+    finally:
+        eval.globalEnv.output.flush()
+        eval.globalEnv.output = None
+
+def fileInputs(source, out):
+    # yield (element, error message, line) for each input of source,
+    # writing the prompts for the lines read to out unless it is None
+    with open(source) as fp:
+        text = fp.read()
+
+    inputs = cache.load(source, text)
+    if inputs is not None:
+        for (prompts, form) in inputs:
+            if out is not None:
+                out.write(prompts)
+            if form is not None:
+                yield cache.loadForm(form)
+        return
+
+    # parse the file, remembering each input as it was before running it
+    # and the prompts shown while reading it
+    inputs = []
+    recorder = cache.Recorder(out)
+    tokenizer = parse.TokenizingReader(io.StringIO(text), recorder)
+    for (elt, message, line) in readInputs(tokenizer):
+        if inputs is not None:
+            try:
+                inputs.append((recorder.take(), cache.dumpForm((elt, message, line))))
+            except (pickle.PicklingError, RecursionError):
+                inputs = None
+        yield (elt, message, line)
+    if inputs is not None:
+        inputs.append((recorder.take(), None))
+        cache.save(source, text, inputs)
+
+def readInputs(tokenizer):
+    # yield (element, error message, line) for each input until the end
+    # of the file or quit; the message is None if the input parsed
     while True:
         tokens = readOne(tokenizer)
         if tokens is None or len(tokens) == 1 and tokens[0][0] == 'quit':
-            if fp != None:
-                # close the input file, start reading from stdin
-                fp.close()
-                fp = None
-                tokenizer = parse.TokenizingReader(sys.stdin, sys.stdout)
-                continue
-
-            # end of file means quitting time
-            print()
-            break
+            return
 
         parser = parse.Parser(tokens)
         (elt, j) = parser.input(0)
         if j < 0:
-            print('Syntax error on input that started on line', tokens[0][1])
-            continue
-        if not parser.finished(j):
-            print('Found extra token beyond end of input:', tokens[j][0])
-            continue
-        if isinstance(elt, ast.Exp):
-            try:
-                values = {}
-                rho = ast.Environment(values, eval.globalEnv)
-                val = eval.eval(elt, rho)
-                print(str(val))
-            except RuntimeError as err:
-                print(err, '(on input that started on line {})'.format(tokens[0][1]))
+            message = 'Syntax error on input that started on line {}'.format(tokens[0][1])
+            yield (None, message, tokens[0][1])
+        elif not parser.finished(j):
+            message = 'Found extra token beyond end of input: {}'.format(tokens[j][0])
+            yield (None, message, tokens[0][1])
         else:
-            print('Unimplemented (on input that starts on line {})'.format(tokens[0][1]))
+            yield (elt, None, tokens[0][1])
+
+def runInput(elt, message, line, out=None):
+    # run one input, writing its result or error to out (default stdout)
+    if out is None:
+        out = sys.stdout
+    if message is not None:
+        print(message, file=out)
+    elif isinstance(elt, ast.Exp):
+        try:
+            elt = prepare(elt, line, out)
+            val = eval.eval(elt)
+            ast.writeSxp(val, out, printDepth, printLength)
+            out.write('\n')
+        except RuntimeError as err:
+            print(err, '(on input that started on line {})'.format(line), file=out)
+    else:
+        print('Unimplemented (on input that starts on line {})'.format(line), file=out)
+
+def prepare(elt, line, out):
+    # optimize elt ahead of eval if we are to report the changes or show
+    # the bytecode, which then goes to out; eval finds nothing more to do
+    if not (reportOptimizations or disassemble):
+        return elt
+    if eval.globalEnv.optimizing:
+        changes = []
+        elt = optimizer.optimize(elt, changes)
+        if reportOptimizations:
+            for change in changes:
+                sys.stderr.write('line {}: {}\n'.format(line, change))
+    if disassemble:
+        vm.dis(vm.compile(elt), out)
+    return elt
 
 def readOne(tokenizer):
     lst = []
@@ -60,7 +246,8 @@ def readOne(tokenizer):
     while True:
         elt = tokenizer.get()
         if elt[0] is None:
-            return None
+            # an input the file ends in the middle of is a syntax error
+            return lst or None
         if elt[0] == '\n':
             if pcount <= 0 and len(lst) > 0:
                 return lst
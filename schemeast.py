@@ -0,0 +1,538 @@
+import io
+
+reservedWords = ('define', 'if', 'while', 'begin', 'set')
+builtIns = ('+', '-', '*', '/', '=', '<', '>',
+    'cons', 'car', 'cdr', 'number?', 'symbol?', 'list?', 'null?',
+    'print')
+
+class Environment:
+    __slots__ = ('values', 'enclosed')
+
+    def __init__(self, values, enclosed):
+        self.values = values
+        self.enclosed = enclosed
+
+# a frame of lexically addressed variables: values is a list indexed by
+# the slot numbers the resolver hands out, one slot per formal, and
+# enclosed is the tuple of variables captured by the closure running in
+# it (see resolve.py)
+class Frame:
+    __slots__ = ('values', 'enclosed')
+
+    def __init__(self, values, enclosed):
+        self.values = values
+        self.enclosed = enclosed
+
+# a variable that closures capture and set assigns to, shared by every
+# frame and closure that has it
+class Box:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+# a global variable: the table of globals (see eval.Globals) keeps one
+# cell for each name for as long as it lives, so a reference can hold on
+# to the cell it found instead of looking its name up every time
+class Cell:
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+class Exp: pass
+
+# value expression
+class ValExp(Exp):
+    def __init__(self, sxp):
+        self.sxp = sxp
+
+    def __str__(self):
+        return str(self.sxp)
+
+    def __repr__(self):
+        s = 'ValExp(' + repr(self.sxp) + ')'
+        return s
+
+# a lambda function
+class Lambda(Exp):
+    def __init__(self, formals, body):
+        self.formals = formals
+        self.body = body
+
+        # the compiled body, filled in by the compiler, the table of
+        # globals it was compiled for, and the body's bytecode, filled in
+        # by the vm
+        self.code = None
+        self.codeTable = None
+        self.bytecode = None
+
+        # filled in by the resolver: the addresses, where a closure is
+        # made, of the variables it captures, and the slots of formals
+        # that live in boxes
+        self.free = ()
+        self.boxes = ()
+
+        # where the lambda starts in the source, and the name it was
+        # first set to, if any, for reports about it
+        self.line = None
+        self.column = None
+        self.name = None
+
+    def __getstate__(self):
+        # compiled code is rebuilt when it is next needed, not pickled
+        state = self.__dict__.copy()
+        state['code'] = None
+        state['codeTable'] = None
+        state['bytecode'] = None
+        return state
+
+    def __str__(self):
+        s = '(lambda ('
+        s += ' '.join([ str(elt) for elt in self.formals ])
+        s += ') '
+        s += str(self.body)
+        s += ')'
+        return s
+
+    def __repr__(self):
+        s = 'Lambda(['
+        s += ', '.join([ repr(elt) for elt in self.formals ])
+        s += '], ' + repr(self.body) + ')'
+        return s
+
+# variable expression
+class VarExp(Exp):
+    def __init__(self, name):
+        self.name = name
+
+        # (0, slot) of a formal or (1, index) of a captured variable, or
+        # None for a global, and whether the variable is in a box
+        self.address = None
+        self.boxed = False
+
+        # the builtin this global held when the optimizer saw it
+        self.builtin = None
+
+        # the cell of this global, found when it was last looked up, and
+        # the version of the table of globals it was found in
+        self.cell = None
+        self.version = None
+
+    def __getstate__(self):
+        # the cell belongs to this process's table, so look it up afresh
+        state = self.__dict__.copy()
+        state['cell'] = None
+        state['version'] = None
+        return state
+
+    def __str__(self):
+        return str(self.name)
+
+    def __repr__(self):
+        s = 'VarExp(' + repr(self.name) + ')'
+        return s
+
+# applicative expression
+class ApExp(Exp):
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+
+        # for set, the address of the variable as for VarExp, or None for
+        # a global (always, for define), and whether it is in a box
+        self.address = None
+        self.boxed = False
+
+        # (value, ((name, builtin), ...)) if the optimizer folded this
+        # application, else None
+        self.folded = None
+
+    def __str__(self):
+        s = '(' + str(self.op)
+        for elt in self.args:
+            s += ' ' + str(elt)
+        s += ')'
+        return s
+
+    def __repr__(self):
+        s = 'ApExp(' + repr(self.op) + ', ['
+        s += ', '.join([ repr(elt) for elt in self.args ])
+        s += '])'
+        return s
+
+# an Sxp can be a NilSxp, a NumSxp, a SymSxp, or a ListSxp
+#
+# Every Sxp class uses __slots__, so a value carries no __dict__.  There
+# is only ever one NilSxp, every symbol name has exactly one SymSxp, and
+# makeNum hands out shared NumSxps for small integers, so nil and symbols
+# can be compared with `is`.
+class Sxp:
+    __slots__ = ()
+
+class NilSxp(Sxp):
+    __slots__ = ()
+
+    def __new__(cls):
+        return nil
+
+    def __reduce__(self):
+        return 'nil'
+
+    def __str__(self):
+        return '()'
+
+    def __repr__(self):
+        return 'NilSxp()'
+
+nil = object.__new__(NilSxp)
+
+class NumSxp(Sxp):
+    __slots__ = ('number',)
+
+    def __init__(self, number):
+        self.number = number
+
+    def __str__(self):
+        return str(self.number)
+
+    def __repr__(self):
+        return 'NumSxp(' + repr(self.number) + ')'
+
+# NumSxps for the integers smallNumLow .. smallNumHigh-1, made once
+smallNumLow, smallNumHigh = -128, 1024
+smallNums = [ NumSxp(n) for n in range(smallNumLow, smallNumHigh) ]
+
+def makeNum(number):
+    if smallNumLow <= number < smallNumHigh:
+        return smallNums[number - smallNumLow]
+    return NumSxp(number)
+
+# the interned SymSxp for each symbol name
+symbols = {}
+
+class SymSxp(Sxp):
+    __slots__ = ('symval',)
+
+    def __new__(cls, symval):
+        sym = symbols.get(symval)
+        if sym is None:
+            sym = object.__new__(cls)
+            sym.symval = symval
+            # another thread may have made the same symbol meanwhile
+            sym = symbols.setdefault(symval, sym)
+        return sym
+
+    def __reduce__(self):
+        return (SymSxp, (self.symval,))
+
+    def __str__(self):
+        return str(self.symval)
+
+    def __repr__(self):
+        return 'SymSxp(' + repr(self.symval) + ')'
+
+true = SymSxp('T')
+
+class ListSxp(Sxp):
+    __slots__ = ('carval', 'cdrval')
+
+    def __init__(self, carval, cdrval):
+        self.carval = carval
+        self.cdrval = cdrval
+
+    def __str__(self):
+        return sxpString(self)
+
+    def __repr__(self):
+        # the cells of a list nest to the right, so write the run of its
+        # cars first and close them all at the end
+        pieces = []
+        cell = self
+        while isinstance(cell, ListSxp):
+            pieces.append('ListSxp(' + repr(cell.carval) + ', ')
+            cell = cell.cdrval
+        return ''.join(pieces) + repr(cell) + ')' * len(pieces)
+
+    def __reduce__(self):
+        # pickle a list as the run of its cars rather than as one cell
+        # inside the next, so long lists do not recurse once per element
+        cars = []
+        cell = self
+        while isinstance(cell, ListSxp):
+            cars.append(cell.carval)
+            cell = cell.cdrval
+        return (buildList, (cars, cell))
+
+def buildList(cars, tail):
+    for car in reversed(cars):
+        tail = ListSxp(car, tail)
+    return tail
+
+# stands for a cons cell in the key of a list
+consMark = object()
+
+def hashKey(sxp):
+    # a hashable Python value standing for sxp's structure, so that two
+    # values have the same key exactly when equal() holds for them:
+    # numbers give their number, nil and symbols themselves (there is one
+    # of each), and a list a flat tuple of its cells and atoms in
+    # preorder, made without recursing so a list nested any depth works
+    if isinstance(sxp, NumSxp):
+        return sxp.number
+    elif isinstance(sxp, SymSxp) or isinstance(sxp, NilSxp):
+        return sxp
+    elif not isinstance(sxp, ListSxp):
+        raise RuntimeError("Cannot hash " + str(sxp))
+    keys = []
+    pending = [sxp]
+    while pending:
+        sxp = pending.pop()
+        if isinstance(sxp, ListSxp):
+            keys.append(consMark)
+            pending.append(sxp.cdrval)
+            pending.append(sxp.carval)
+        elif isinstance(sxp, NumSxp):
+            keys.append(sxp.number)
+        elif isinstance(sxp, SymSxp) or isinstance(sxp, NilSxp):
+            keys.append(sxp)
+        else:
+            raise RuntimeError("Cannot hash " + str(sxp))
+    return tuple(keys)
+
+def equal(a, b):
+    # whether a and b are equal numbers, the same symbol, both nil, or
+    # lists whose elements and tails are equal; what = tests
+    pending = [(a, b)]
+    while pending:
+        a, b = pending.pop()
+        if isinstance(a, ListSxp):
+            if not isinstance(b, ListSxp):
+                return False
+            if a is not b:
+                pending.append((a.cdrval, b.cdrval))
+                pending.append((a.carval, b.carval))
+        elif isinstance(a, NumSxp):
+            if not (isinstance(b, NumSxp) and a.number == b.number):
+                return False
+        elif not (a is b and (isinstance(a, SymSxp) or isinstance(a, NilSxp))):
+            return False
+    return True
+
+# how many pieces writeSxp collects before writing them out
+writeChunk = 4096
+
+def writeSxp(sxp, out, depth=None, length=None):
+    # write sxp to the stream out without recursing, so any length or
+    # nesting of lists and tables prints in constant Python stack.  Those
+    # nested more than depth deep are written (...) or {...}, and only
+    # the first length elements of each are written, then ...
+    pieces = []
+
+    # for each list being written, [the cell holding its next element,
+    # how many elements are written]; for each table, what tableParts has
+    # yet to give
+    open = []
+
+    # the tables being written, so a table inside itself is written {...}
+    tables = []
+
+    val = sxp
+    while True:
+        if isinstance(val, ListSxp):
+            if depth is not None and len(open) >= depth:
+                pieces.append('(...)')
+            else:
+                pieces.append('(')
+                open.append([val, 0])
+        elif isinstance(val, TableSxp):
+            if depth is not None and len(open) >= depth or val in tables:
+                pieces.append('{...}')
+            else:
+                open.append(tableParts(val, length))
+                tables.append(val)
+        elif isinstance(val, VectorSxp):
+            pieces.append(vectorText(val, length))
+        else:
+            pieces.append(str(val))
+
+        # find the next element to write, closing the lists and tables
+        # that have none left
+        val = None
+        while open:
+            if type(open[-1]) is not list:
+                text, val = next(open[-1])
+                pieces.append(text)
+                if val is not None:
+                    break
+                open.pop()
+                tables.pop()
+                continue
+            cell, count = open[-1]
+            if isinstance(cell, ListSxp):
+                if count > 0:
+                    pieces.append(' ')
+                if length is not None and count >= length:
+                    pieces.append('...)')
+                    open.pop()
+                    continue
+                open[-1][0] = cell.cdrval
+                open[-1][1] = count + 1
+                val = cell.carval
+                break
+            if not isinstance(cell, NilSxp):
+                pieces.append(' . ' + str(cell))
+            pieces.append(')')
+            open.pop()
+
+        if len(pieces) >= writeChunk:
+            out.write(''.join(pieces))
+            pieces = []
+        if val is None:
+            break
+    out.write(''.join(pieces))
+
+def tableParts(table, length):
+    # (text, key or value) for each key and value of a table to write,
+    # the text being what goes before it, then (closing text, None);
+    # tables are written {key value, key value}
+    text = '{'
+    count = 0
+    for (key, value) in table.entries.values():
+        if length is not None and count >= length:
+            yield (text + '...}', None)
+            return
+        yield (text, key)
+        yield (' ', value)
+        text = ', '
+        count += 1
+    yield ('}' if count > 0 else '{}', None)
+
+def sxpString(sxp, depth=None, length=None):
+    out = io.StringIO()
+    writeSxp(sxp, out, depth, length)
+    return out.getvalue()
+
+# a hash table.  Keys are compared by structure, as hashKey sees them:
+# numbers by value, symbols and nil by identity (so as = compares them)
+# and lists element by element
+class TableSxp(Sxp):
+    __slots__ = ('entries',)
+
+    def __init__(self):
+        # hashKey(key) -> (key, value), in the order keys were added
+        self.entries = {}
+
+    def __str__(self):
+        return sxpString(self)
+
+    def __repr__(self):
+        return 'TableSxp(' + repr(list(self.entries.values())) + ')'
+
+class KeyIterator(Sxp):
+    # walks over the keys of a table in the order they were added,
+    # looking one key ahead so it can tell when there are no more
+    __slots__ = ('entries', 'ahead')
+
+    def __init__(self, table):
+        self.entries = iter(table.entries.values())
+        self.ahead = None
+        self.advance()
+
+    def advance(self):
+        # the key looked ahead at before, and look at the one after it
+        key = self.ahead
+        try:
+            self.ahead = next(self.entries, None)
+        except RuntimeError:
+            raise RuntimeError("Table changed while iterating over its keys")
+        return key
+
+    def __str__(self):
+        return '<iterator>'
+
+    def __repr__(self):
+        return 'KeyIterator()'
+
+# a vector of integers, whose items are an array.array or NumPy array
+# (see vector.py)
+class VectorSxp(Sxp):
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __str__(self):
+        return vectorText(self, None)
+
+    def __repr__(self):
+        return 'VectorSxp(' + repr(self.items.tolist()) + ')'
+
+def vectorText(v, length):
+    items = v.items.tolist()
+    if length is not None and len(items) > length:
+        return '#(' + ' '.join([ str(n) for n in items[:length] ] + ['...']) + ')'
+    return '#(' + ' '.join([ str(n) for n in items ]) + ')'
+
+class Closure(Sxp):
+    __slots__ = ('f', 'environment')
+
+    def __init__(self, f, environment):
+        self.f = f
+        self.environment = environment
+
+    def __str__(self):
+        return '<closure>'
+
+    def __repr__(self):
+        s = 'Closure(' + repr(self.f)
+        s += ', ' + repr(self.environment) + ')'
+        return s
+
+class PrimOp(Sxp):
+    __slots__ = ('name', 'f', 'nargs', 'f1', 'f2')
+
+    def __init__(self, name, f, nargs):
+        # the name of this primitive operation, e.g. "+"
+        self.name = name
+
+        # a function that implements this primitive operation
+        # it should accept a single parameters, which is a list of
+        # evaluated arguments
+        self.f = f
+
+        # the number of arguments this op requires
+        self.nargs = nargs
+
+        # for a primop made by unary() or binary(), the function taking
+        # its one or two arguments directly, which evaluators call
+        # rather than building a list for f
+        self.f1 = None
+        self.f2 = None
+
+    @classmethod
+    def unary(cls, name, f1):
+        prim = cls(name, None, 1)
+        prim.f = prim.callUnary
+        prim.f1 = f1
+        return prim
+
+    @classmethod
+    def binary(cls, name, f2):
+        prim = cls(name, None, 2)
+        prim.f = prim.callBinary
+        prim.f2 = f2
+        return prim
+
+    def callUnary(self, args):
+        return self.f1(args[0])
+
+    def callBinary(self, args):
+        return self.f2(args[0], args[1])
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return '<primop ' + self.name + '>'
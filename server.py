@@ -0,0 +1,216 @@
+import sys, asyncio, concurrent.futures
+import parse, eval, scheme, image, interpreter
+
+# A server for many REPL sessions at once in one long-lived process.  The
+# event loop only moves bytes: each connection gets a session that runs
+# in a thread of its own, reading inputs with the usual TokenizingReader
+# and evaluating them there, so a client running something slow holds up
+# its own thread and nobody else.  There is a thread for every session
+# the server allows at once; clients past that are turned away, and
+# clients that go quiet are disconnected, so none waits forever.
+#
+# Every session has an Interpreter of its own, with the server's engine,
+# optimizer setting and limits on each input, so its globals start from
+# the builtins as they were at startup; sets and rebinding of builtins in
+# one session are never seen by another, and the shared builtin primops
+# themselves are never changed.
+#
+# A session reads and writes through its connection, so prompts, results
+# and whatever print writes all go to its client.  With an image, every
+# session starts from the globals saved in it, loaded afresh for each.
+
+# how many sessions run at once; a client beyond that is told the server
+# is busy and disconnected, rather than left waiting for a thread
+maxSessions = 64
+
+# how many seconds a session waits for its client to send a line before
+# closing the connection, so idle clients do not hold threads for good
+idleTimeout = 600
+
+# how much output a session collects before sending it
+sendBufferSize = 1 << 16
+
+# the longest line a session reads; a longer one is skipped with an error
+lineLimit = 1 << 26
+
+class Stream:
+    # a blocking text stream over a connection, for a session's thread:
+    # readline waits for the event loop to read the next line, and what
+    # is written is collected and handed to the loop to send when the
+    # buffer fills or on flush, which also waits for a slow client
+    def __init__(self, reader, writer, loop):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.pending = []
+        self.size = 0
+
+    def wait(self, coroutine):
+        # run coroutine on the event loop and wait for its result; a
+        # connection or server that has gone away ends the session
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        except RuntimeError:
+            coroutine.close()
+            raise ConnectionResetError('server stopped')
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise ConnectionResetError('server stopped')
+
+    def readline(self):
+        self.flush()
+        try:
+            line = self.wait(asyncio.wait_for(self.readLine(), idleTimeout))
+        except asyncio.TimeoutError:
+            self.write('\nIdle for {} seconds; closing the session\n'.format(idleTimeout))
+            self.flush()
+            raise ConnectionResetError('client idle')
+        if line is None:
+            raise RuntimeError('longer than {} bytes'.format(lineLimit))
+        return line.decode('utf-8', 'replace')
+
+    async def readLine(self):
+        # the next line, or None for one longer than lineLimit, which is
+        # read up to its end and thrown away
+        try:
+            return await self.reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as err:
+            return err.partial
+        except asyncio.LimitOverrunError:
+            pass
+        while True:
+            try:
+                await self.reader.readuntil(b'\n')
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as err:
+                await self.reader.readexactly(err.consumed)
+
+    def write(self, s):
+        self.pending.append(s)
+        self.size += len(s)
+        if self.size >= sendBufferSize:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            data = ''.join(self.pending).encode('utf-8')
+            self.pending = []
+            self.size = 0
+            self.wait(self.send(data))
+
+    async def send(self, data):
+        if self.writer.is_closing():
+            raise ConnectionResetError('client went away')
+        self.writer.write(data)
+        await self.writer.drain()
+
+class Session:
+    def __init__(self, stream, source, imageData):
+        # made on the event loop's thread, whose engine, optimizer
+        # setting and meter are the server's
+        self.stream = stream
+        self.source = source
+        self.imageData = imageData
+        meter = eval.globalEnv.meter
+        self.interpreter = interpreter.Interpreter(eval.globalEnv.engine,
+            eval.globalEnv.optimizing, stream,
+            meter.maxSteps, meter.maxCells, meter.timeLimit)
+
+    def run(self):
+        # runs in a pool thread, which is given back as it was once the
+        # session ends
+        try:
+            with self.interpreter.active():
+                self.converse()
+        finally:
+            self.interpreter.close()
+
+    def converse(self):
+        try:
+            self.stream.write('Scheme interpreter\n')
+            if self.imageData is not None:
+                image.loads(self.imageData, self.interpreter.table)
+            if self.source != '':
+                for (elt, message, line) in scheme.fileInputs(self.source, self.stream):
+                    scheme.runInput(elt, message, line, self.stream)
+            tokenizer = parse.TokenizingReader(self.stream, self.stream)
+            while True:
+                try:
+                    for (elt, message, line) in scheme.readInputs(tokenizer):
+                        scheme.runInput(elt, message, line, self.stream)
+                    break
+                except RuntimeError as err:
+                    # a line too long to read: drop the input it was in
+                    tokenizer.lineNumber += 1
+                    tokenizer.continuePrompt(False)
+                    self.stream.write('Line {} is {}; dropped the input it was in\n'.format(
+                        tokenizer.lineNumber, err))
+            self.stream.write('\n')
+            self.stream.flush()
+        except (ConnectionError, OSError):
+            pass
+
+def parseAddress(address):
+    # a path (anything with a /) is a Unix socket, otherwise [HOST:]PORT
+    if '/' in address:
+        return (None, address)
+    host, sep, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError('bad address: ' + address)
+    return (host or '127.0.0.1', int(port))
+
+async def listen(address, source, imageData, executor):
+    # the sessions running, each in a thread of the executor, which has
+    # one for each session there can be
+    running = [0]
+
+    async def connected(reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            if running[0] >= maxSessions:
+                writer.write('Server busy: {} sessions running; try again later\n'.format(
+                    maxSessions).encode('utf-8'))
+                await writer.drain()
+                # let the client see the message before the connection
+                # closes, rather than have what it sent reset it
+                if writer.can_write_eof():
+                    writer.write_eof()
+                try:
+                    await asyncio.wait_for(reader.read(lineLimit), 1)
+                except asyncio.TimeoutError:
+                    pass
+                return
+            running[0] += 1
+            try:
+                session = Session(Stream(reader, writer, loop), source, imageData)
+                await loop.run_in_executor(executor, session.run)
+            finally:
+                running[0] -= 1
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    host, port = parseAddress(address)
+    if host is None:
+        listener = await asyncio.start_unix_server(connected, port, limit=lineLimit)
+    else:
+        listener = await asyncio.start_server(connected, host, port, limit=lineLimit)
+    names = [ str(s.getsockname()) for s in listener.sockets ]
+    sys.stderr.write('Serving on ' + ', '.join(names) + '\n')
+    async with listener:
+        await listener.serve_forever()
+
+def serve(address, source='', imageData=None):
+    # serve sessions on address until interrupted; the image data and
+    # source, if given, are loaded and run at the start of every session
+    executor = concurrent.futures.ThreadPoolExecutor(maxSessions)
+    try:
+        asyncio.run(listen(address, source, imageData, executor))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=False)
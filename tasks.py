@@ -0,0 +1,261 @@
+import collections
+import schemeast as ast
+import eval
+import cek
+import budget
+
+# Cooperative tasks and the channels they talk through.  A task is a
+# closure running on its own cek machine (see cek.py): the machine keeps
+# the whole continuation in the task's stack, so when an operation has to
+# wait, the machine just returns, and the task is resumed later by
+# running the machine again on the same stack with the operation's value.
+# A task only gives way to others in yield, in send to a full channel, in
+# recv from an empty one and in sleep.
+#
+# Anything else that waits, the program's own inputs say, or a task
+# waiting inside a primop that called back into Scheme, cannot be put
+# aside like that, so it runs the other tasks itself until it can go on.
+# Every input runs the tasks still ready when it is done, until none are;
+# tasks still sleeping then carry on in a later input, once their time is
+# up.
+#
+# Each thread (so each server session) has its own scheduler, with its
+# own asyncio event loop for the operations that wait on I/O, so far just
+# sleep.  That loop cannot run inside another one, so sleep is an error
+# in a thread that is already running an asyncio event loop, such as a
+# service that embeds an Interpreter.  Tasks need the flat closures that
+# every engine but tree makes.
+
+class Task(ast.Sxp):
+    __slots__ = ('stack',)
+
+    def __init__(self):
+        # the continuation of the task's machine while it waits
+        self.stack = []
+
+    def __str__(self):
+        return '<task>'
+
+    def __repr__(self):
+        return 'Task()'
+
+class Channel(ast.Sxp):
+    __slots__ = ('capacity', 'items', 'receivers', 'senders')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = collections.deque()
+
+        # tasks waiting for an item, and (task, value) for tasks waiting
+        # for room for their value
+        self.receivers = collections.deque()
+        self.senders = collections.deque()
+
+    def __str__(self):
+        return '<channel>'
+
+    def __repr__(self):
+        return 'Channel(' + repr(self.capacity) + ')'
+
+class Operation(ast.PrimOp):
+    # a primop that may have to wait.  attempt(task, args) is what the
+    # cek machine of a task calls: it gives the operation's value, or
+    # None once it has arranged for the task to be resumed with the value
+    # later.  Called through f, as everything else calls it, attempt is
+    # given no task and waits for the value there and then
+    __slots__ = ('attempt',)
+
+    def __init__(self, name, attempt, nargs):
+        ast.PrimOp.__init__(self, name, None, nargs)
+        self.f = self.call
+        self.attempt = attempt
+
+    def call(self, args):
+        return self.attempt(None, args)
+
+class Scheduler:
+    def __init__(self):
+        # (task, expression) for each task that can run, where the
+        # expression starts it or is the value it is resumed with
+        self.ready = collections.deque()
+
+        # the event loop, made when first needed, and for each of its
+        # futures the task waiting for it, if any
+        self.loop = None
+        self.futures = {}
+
+    def start(self, task, exp):
+        self.ready.append((task, exp))
+
+    def resume(self, task, val):
+        self.ready.append((task, ast.ValExp(val)))
+
+    def runOne(self):
+        task, exp = self.ready.popleft()
+        try:
+            cek.execute(exp, None, task)
+        except budget.BudgetExceeded:
+            # the input that ran the task is over budget, not the task
+            raise
+        except RuntimeError as err:
+            raise RuntimeError('Error in task: ' + str(err))
+
+    def turn(self, done, block):
+        # run each task that was ready once, or until done() holds, then
+        # let the event loop finish what I/O it can; if block is true, it
+        # waits for some if no task could run
+        for i in range(len(self.ready)):
+            self.runOne()
+            if done is not None and done():
+                return
+        if self.futures:
+            self.poll(block and not self.ready)
+
+    def runUntil(self, done, name):
+        # run tasks until done() holds, for an operation outside a task
+        while not done():
+            if not self.ready and not self.futures:
+                raise RuntimeError(name + ' would wait forever')
+            self.turn(done, True)
+
+    def runAll(self):
+        # run tasks until none is ready, without waiting for any I/O
+        if self.futures:
+            self.poll(False)
+        while self.ready:
+            self.turn(None, False)
+
+    def eventLoop(self):
+        if self.loop is None:
+            # imported when first needed, as it takes a while
+            import asyncio
+            self.asyncio = asyncio
+            self.loop = self.asyncio.new_event_loop()
+        return self.loop
+
+    def checkWait(self, name):
+        # refuse to wait on I/O in a thread whose own event loop is running
+        self.eventLoop()
+        try:
+            self.asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        raise RuntimeError(name + ' cannot wait in a thread that is running an asyncio event loop')
+
+    def wait(self, task, awaitable):
+        # run a coroutine or future on the event loop; task, if any, is
+        # resumed with nil when it finishes.  Returns its future
+        future = self.asyncio.ensure_future(awaitable, loop=self.eventLoop())
+        self.futures[future] = task
+        return future
+
+    def poll(self, block):
+        asyncio = self.asyncio
+        try:
+            if block:
+                self.loop.run_until_complete(asyncio.wait(list(self.futures),
+                    return_when=asyncio.FIRST_COMPLETED))
+            else:
+                self.loop.run_until_complete(asyncio.sleep(0))
+        except Exception:
+            # the loop could not run, so nothing it was to do will happen
+            self.cancel()
+            raise
+        for future in [ f for f in self.futures if f.done() ]:
+            task = self.futures.pop(future)
+            if task is not None:
+                self.resume(task, eval.nilValue)
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures.clear()
+
+    def close(self):
+        if self.loop is not None:
+            self.cancel()
+            self.loop.close()
+
+def scheduler():
+    # this thread's scheduler
+    if eval.globalEnv.scheduler is None:
+        eval.globalEnv.scheduler = Scheduler()
+    return eval.globalEnv.scheduler
+
+def checkChannel(name, ch):
+    if not isinstance(ch, Channel):
+        raise RuntimeError("Argument of " + name + " not a channel")
+
+def spawn(f):
+    if not (isinstance(f, ast.Closure) or isinstance(f, ast.PrimOp)):
+        raise RuntimeError("Argument of spawn not a function")
+    if eval.globalEnv.engine == 'tree':
+        raise RuntimeError("spawn needs the compile, cek or vm engine")
+    task = Task()
+    scheduler().start(task, ast.ApExp(ast.ValExp(f), []))
+    return task
+
+def makeChannel(n):
+    if not (isinstance(n, ast.NumSxp) and n.number > 0):
+        raise RuntimeError("Argument of make-channel not a positive number")
+    return Channel(n.number)
+
+def yieldTask(task, args):
+    s = scheduler()
+    if task is not None:
+        s.resume(task, eval.nilValue)
+        return None
+    # let every task that is ready now run once
+    s.turn(None, False)
+    return eval.nilValue
+
+def send(task, args):
+    ch, val = args
+    checkChannel('send', ch)
+    if ch.receivers:
+        scheduler().resume(ch.receivers.popleft(), val)
+        return val
+    if len(ch.items) < ch.capacity:
+        ch.items.append(val)
+        return val
+    if task is not None:
+        ch.senders.append((task, val))
+        return None
+    scheduler().runUntil(lambda: ch.receivers or len(ch.items) < ch.capacity, 'send')
+    return send(None, args)
+
+def recv(task, args):
+    (ch,) = args
+    checkChannel('recv', ch)
+    if ch.items:
+        val = ch.items.popleft()
+        if ch.senders:
+            sender, sent = ch.senders.popleft()
+            ch.items.append(sent)
+            scheduler().resume(sender, sent)
+        return val
+    if task is not None:
+        ch.receivers.append(task)
+        return None
+    scheduler().runUntil(lambda: ch.items, 'recv')
+    return recv(None, args)
+
+def finish(future):
+    if not future.done():
+        future.set_result(None)
+
+def sleep(task, args):
+    (ms,) = args
+    if not (isinstance(ms, ast.NumSxp) and ms.number >= 0):
+        raise RuntimeError("Argument of sleep not a number of milliseconds")
+    s = scheduler()
+    s.checkWait('sleep')
+    # a future the loop finishes itself, so one pass over it is enough
+    # to see that the time is up
+    future = s.loop.create_future()
+    s.loop.call_later(ms.number / 1000, finish, future)
+    s.wait(task, future)
+    if task is not None:
+        return None
+    s.runUntil(future.done, 'sleep')
+    return eval.nilValue
@@ -0,0 +1,135 @@
+# The limits of budget.py: --max-steps, --max-cells and --time-limit stop
+# programs that never stop on every engine, the REPL carries on with the
+# next input, and an embedded Interpreter enforces the same limits.
+#
+#   python3 -m pytest tests      or      python3 -m unittest discover tests
+
+import os, sys, subprocess, threading, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+scheme = os.path.join(here, '..', 'scheme.py')
+
+import schemeast as ast
+import budget, interpreter, pmap
+
+engines = ('compile', 'cek', 'vm', 'tree')
+
+def run(engine, source, *flags):
+    result = subprocess.run([sys.executable, scheme, '--engine', engine, '--no-cache'] + list(flags),
+        input=source, capture_output=True, text=True, timeout=60)
+    return result.stdout + result.stderr
+
+def results(output):
+    # what the REPL echoed for each input
+    return [ line.rpartition('--> ')[2] for line in output.splitlines()
+        if line.startswith('--> ') ][:-1]
+
+loop = "(while 'T 1)\n(+ 1 2)\n"
+tailLoop = "(define (spin n) (spin n))\n(spin 1)\n(+ 1 2)\n"
+growth = "(set l '())\n(while 'T (set l (cons 1 l)))\n(+ 1 2)\n"
+deep = "(define (deep n) (if (= n 0) 0 (+ 1 (deep (- n 1)))))\n(deep 100000)\n(deep 10)\n"
+
+class CommandLineTest(unittest.TestCase):
+    def test_max_steps(self):
+        message = 'Evaluation took more than 100 steps (on input that started on line '
+        for engine in engines:
+            with self.subTest(engine=engine):
+                self.assertEqual(results(run(engine, loop, '--max-steps', '100')),
+                    [message + '1)', '3'])
+                self.assertEqual(results(run(engine, tailLoop, '--max-steps', '100')),
+                    ['spin', message + '2)', '3'])
+
+    def test_time_limit(self):
+        message = 'Evaluation took more than 0.2 seconds (on input that started on line '
+        for engine in engines:
+            with self.subTest(engine=engine):
+                self.assertEqual(results(run(engine, loop, '--time-limit', '0.2')),
+                    [message + '1)', '3'])
+        for engine in ('cek', 'vm'):
+            with self.subTest(engine=engine):
+                self.assertEqual(results(run(engine, tailLoop, '--time-limit', '0.2')),
+                    ['spin', message + '2)', '3'])
+
+    def test_max_cells(self):
+        message = 'Evaluation allocated more than 1000 cells (on input that started on line 2)'
+        for engine in engines:
+            with self.subTest(engine=engine):
+                self.assertEqual(results(run(engine, growth, '--max-cells', '1000')),
+                    ['()', message, '3'])
+
+    def test_recursion_too_deep(self):
+        # the engines that recurse in Python turn running out of its stack
+        # into a budget error, with or without limits
+        for engine in ('compile', 'tree'):
+            with self.subTest(engine=engine):
+                message = 'Recursion too deep for the {} engine (on input that started on line 2)'
+                self.assertEqual(results(run(engine, deep)),
+                    ['deep', message.format(engine), '10'])
+        for engine in ('cek', 'vm'):
+            with self.subTest(engine=engine):
+                self.assertEqual(results(run(engine, deep)), ['deep', '100000', '10'])
+
+class InterpreterTest(unittest.TestCase):
+    def test_max_steps(self):
+        for engine in engines:
+            with self.subTest(engine=engine):
+                interp = interpreter.Interpreter(engine=engine, maxSteps=100)
+                with self.assertRaises(budget.BudgetExceeded):
+                    interp.evalString(loop)
+                interp.evalString("(define (spin n) (spin n))")
+                with self.assertRaises(budget.BudgetExceeded):
+                    interp.call('spin', ast.makeNum(1))
+                self.assertEqual(interp.evalString('(+ 1 2)').number, 3)
+
+                # the budget is for each input or call, not all of them
+                interp.evalString("(define (count n) (if (= n 0) 0 (count (- n 1))))")
+                for i in range(3):
+                    self.assertEqual(interp.call('count', ast.makeNum(50)).number, 0)
+                interp.close()
+
+    def test_max_cells(self):
+        interp = interpreter.Interpreter(maxCells=1000)
+        with self.assertRaises(budget.BudgetExceeded):
+            interp.evalString(growth)
+        interp.close()
+
+    def test_pmap_workers(self):
+        # workers go on with the caller's budget, also when started from a
+        # fork server because the caller has other threads
+        saved = pmap.workers
+        pmap.workers = 2
+        self.addCleanup(setattr, pmap, 'workers', saved)
+        for threaded in (False, True):
+            with self.subTest(threaded=threaded):
+                interp = interpreter.Interpreter(maxSteps=1000)
+                interp.evalString("(define (spin n) (while 'T n))")
+                failures = []
+                def work():
+                    try:
+                        interp.evalString("(pmap spin '(1 2 3 4))")
+                    except budget.BudgetExceeded as err:
+                        failures.append(str(err))
+                if threaded:
+                    thread = threading.Thread(target=work)
+                    thread.start()
+                    thread.join()
+                else:
+                    work()
+                self.assertEqual(failures,
+                    ['Evaluation took more than 1000 steps (on input that started on line 1)'])
+
+    def test_recursion_too_deep(self):
+        for engine in ('compile', 'tree'):
+            with self.subTest(engine=engine):
+                interp = interpreter.Interpreter(engine=engine)
+                interp.evalString("(define (deep n) (if (= n 0) 0 (+ 1 (deep (- n 1)))))")
+                with self.assertRaises(budget.BudgetExceeded):
+                    interp.call('deep', ast.makeNum(100000))
+                with self.assertRaises(budget.BudgetExceeded):
+                    interp.evalString('(deep 100000)')
+                self.assertEqual(interp.call('deep', ast.makeNum(10)).number, 10)
+                interp.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# The cache of parsed source files (see cache.py): a run that reads the
+# cache prints exactly what a run that parses does, an edited file is
+# parsed again, --cache-dir puts cache files elsewhere, and a corrupt
+# cache file is ignored and replaced.
+#
+#   python3 -m pytest tests      or      python3 -m unittest discover tests
+
+import os, sys, subprocess, tempfile, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+scheme = os.path.join(here, '..', 'scheme.py')
+
+source = """(define (sq x)
+  (* x x))
+(print (sq 4))
+(sq (sq
+ 3))
+(car 1)
+(+ 1
+"""
+
+def run(path, *flags):
+    result = subprocess.run([sys.executable, scheme] + list(flags) + [path],
+        input='', capture_output=True, text=True, timeout=60)
+    return result.stdout + result.stderr
+
+def stamp(path):
+    # changes whenever the file is written again
+    status = os.stat(path)
+    return (status.st_ino, status.st_mtime_ns)
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'prog.scm')
+        self.write(source)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, text):
+        with open(self.path, 'w') as fp:
+            fp.write(text)
+
+    def test_hit(self):
+        parsed = run(self.path, '--no-cache')
+        self.assertFalse(os.path.exists(self.path + '.cache'))
+        self.assertEqual(run(self.path), parsed)
+        before = stamp(self.path + '.cache')
+        self.assertEqual(run(self.path), parsed)
+        self.assertEqual(stamp(self.path + '.cache'), before)
+
+    def test_edit(self):
+        run(self.path)
+        before = stamp(self.path + '.cache')
+        self.write(source.replace('(* x x)', '(+ x x)'))
+        edited = run(self.path)
+        self.assertIn('8', edited)
+        self.assertEqual(edited, run(self.path, '--no-cache'))
+        self.assertNotEqual(stamp(self.path + '.cache'), before)
+
+    def test_cache_dir(self):
+        folder = os.path.join(self.directory.name, 'caches')
+        parsed = run(self.path, '--no-cache')
+        self.assertEqual(run(self.path, '--cache-dir', folder), parsed)
+        self.assertFalse(os.path.exists(self.path + '.cache'))
+        (name,) = os.listdir(folder)
+        before = stamp(os.path.join(folder, name))
+        self.assertEqual(run(self.path, '--cache-dir', folder), parsed)
+        self.assertEqual(stamp(os.path.join(folder, name)), before)
+
+    def test_corrupt(self):
+        parsed = run(self.path, '--no-cache')
+        run(self.path)
+        with open(self.path + '.cache', 'rb') as fp:
+            good = fp.read()
+        middle = len(good) // 2
+        flipped = good[:middle] + bytes([good[middle] ^ 0xff]) + good[middle+1:]
+        for bad in (b'', b'not a cache file', good[:middle], good[:-3], flipped, bytes(range(256))):
+            with self.subTest(bad=bad[:20]):
+                with open(self.path + '.cache', 'wb') as fp:
+                    fp.write(bad)
+                self.assertEqual(run(self.path), parsed)
+
+                # and the cache was made again
+                before = stamp(self.path + '.cache')
+                self.assertEqual(run(self.path), parsed)
+                self.assertEqual(stamp(self.path + '.cache'), before)
+
+if __name__ == '__main__':
+    unittest.main()
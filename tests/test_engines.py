@@ -0,0 +1,127 @@
+# Every engine must give the same results as the tree-walker.  Each
+# program is fed to scheme.py's REPL under every engine and the echoed
+# results compared, so that errors and print output are compared too.
+#
+#   python3 -m pytest tests      or      python3 -m unittest discover tests
+
+import os, sys, subprocess, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+scheme = os.path.join(here, '..', 'scheme.py')
+
+engines = ('compile', 'cek', 'vm')
+
+programs = {
+    'arithmetic': """
+(+ 1 (* 2 3))
+(- 10 (/ 9 3))
+(< 1 2)
+""",
+    'closures': """
+(define (adder n) (lambda (x) (+ x n)))
+((adder 3) 4)
+(define (counter) (begin (set n 0) (lambda () (begin (set n (+ n 1)) n))))
+(set c (counter))
+(c)
+(c)
+(define (fact n) (if (= n 0) 1 (* n (fact (- n 1)))))
+(fact 20)
+""",
+    'rebinding builtins': """
+(+ 1 (begin (set + -) 2))
+(+ 5 1)
+(set + (lambda (a b) (* a b)))
+(+ 3 4)
+(car (begin (set car cdr) '(1 2)))
+(car '(1 2))
+(define (f x) (cons x x))
+(f 1)
+(set cons (lambda (a b) a))
+(f 1)
+""",
+    'folding and rebinding': """
+(define (g) (+ 1 2))
+(g)
+(set + *)
+(g)
+(+ 1 2)
+""",
+    'equality and tables': """
+(= '(1 (2 a)) '(1 (2 a)))
+(= '(1 2) '(1 3))
+(set t (make-table))
+(table-set! t '(1 2) 'x)
+(table-ref t (cons 1 (cons 2 '())))
+(set it (table-iterator t))
+(iterator-next it)
+(iterator-done? it)
+""",
+    'vectors': """
+(set big 9223372036854775807)
+(set v (list->vector (cons big (cons big '()))))
+(vector-sum v)
+(vector->list (vector* (vector-range 0 4) 3))
+(vector+ v 1)
+(vector- (vector-range 0 3) 100000000000000000000)
+""",
+    'loops and lists': """
+(set i 0)
+(set acc '())
+(while (< i 5) (begin (set acc (cons i acc)) (set i (+ i 1))))
+acc
+(car (cdr acc))
+""",
+    'errors': """
+(car 1)
+(undefined-thing 1)
+((lambda (x) x))
+((lambda (x) x) (print 1) (print 2))
+(set b 5)
+(b (print 'side))
+(car (print 'one) (print 'two))
+(set n 0)
+((lambda () n) (set n 1))
+n
+(+ 1 2)
+""",
+}
+
+# programs whose recursion is too deep for Python's stack, which only the
+# engines with a stack of their own can run, with what they must print
+deepPrograms = {
+    'deep memoized recursion': ("""
+(define (count n) (if (= n 0) 0 (+ 1 (count (- n 1)))))
+(set count (memoize count))
+(count 20000)
+(count 20000)
+(memo-stats count)
+""", ['count', '<memoized closure>', '20000', '20000', '(1 20001 10000)']),
+}
+
+def run(engine, source):
+    result = subprocess.run([sys.executable, scheme, '--engine', engine, '--no-cache'],
+        input=source, capture_output=True, text=True, timeout=60)
+    return result.stdout + result.stderr
+
+def results(output):
+    # what the REPL echoed for each input, after the prompts for it and
+    # for any blank lines before it
+    return [ line.rpartition('--> ')[2] for line in output.splitlines()
+        if line.startswith('--> ') ][:-1]
+
+class EngineTest(unittest.TestCase):
+    def test_engines_agree(self):
+        for (name, source) in programs.items():
+            expected = run('tree', source)
+            for engine in engines:
+                with self.subTest(program=name, engine=engine):
+                    self.assertEqual(run(engine, source), expected)
+
+    def test_deep_recursion(self):
+        for (name, (source, expected)) in deepPrograms.items():
+            for engine in ('cek', 'vm'):
+                with self.subTest(program=name, engine=engine):
+                    self.assertEqual(results(run(engine, source)), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# Images (see image.py): globals saved by one interpreter come back in
+# another with what they shared and their cycles intact, memoized
+# closures keep working, and images do not cross between the tree engine
+# and the others.
+#
+#   python3 -m pytest tests      or      python3 -m unittest discover tests
+
+import os, sys, tempfile, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+import interpreter
+
+prelude = """
+(set tail '(3 4))
+(set a (cons 1 tail))
+(set b (cons 2 tail))
+(set t (make-table))
+(set l (cons t '()))
+(table-set! t 'self l)
+(define (sq x) (* x x))
+(set msq (memoize sq))
+(msq 4)
+(define (adder n) (lambda (x) (+ x n)))
+(set add3 (adder 3))
+"""
+
+class ImageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'prelude.image')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def saved(self, engine):
+        interp = interpreter.Interpreter(engine=engine)
+        interp.evalString(prelude)
+        interp.saveImage(self.path)
+        return interp
+
+    def test_round_trip(self):
+        for made in ('compile', 'cek', 'vm'):
+            for runs in ('compile', 'cek', 'vm'):
+                with self.subTest(made=made, runs=runs):
+                    self.saved(made)
+                    interp = interpreter.Interpreter(engine=runs)
+                    interp.loadImage(self.path)
+                    lookup = interp.table.lookup
+
+                    # shared tails are still shared
+                    self.assertIs(lookup('a').cdrval, lookup('tail'))
+                    self.assertIs(lookup('b').cdrval, lookup('tail'))
+
+                    # and the table and list still refer to each other
+                    self.assertIs(interp.evalString("(table-ref t 'self)"), lookup('l'))
+                    self.assertIs(lookup('l').carval, lookup('t'))
+
+                    # closures and the memo's entries come back
+                    self.assertEqual(interp.evalString('(add3 4)').number, 7)
+                    self.assertEqual(interp.evalString('(msq 4)').number, 16)
+                    self.assertEqual(interp.evalString('(msq 5)').number, 25)
+                    self.assertEqual(str(interp.evalString('(memo-stats msq)')), '(1 2 2)')
+
+    def test_tree_round_trip(self):
+        self.saved('tree')
+        interp = interpreter.Interpreter(engine='tree')
+        interp.loadImage(self.path)
+        self.assertEqual(interp.evalString('(add3 4)').number, 7)
+        self.assertEqual(interp.evalString('(msq 5)').number, 25)
+
+    def test_engines_do_not_mix(self):
+        self.saved('tree')
+        for engine in ('compile', 'cek', 'vm'):
+            with self.subTest(made='tree', runs=engine):
+                with self.assertRaises(RuntimeError):
+                    interpreter.Interpreter(engine=engine).loadImage(self.path)
+        self.saved('compile')
+        with self.assertRaises(RuntimeError):
+            interpreter.Interpreter(engine='tree').loadImage(self.path)
+
+    def test_corrupt_image(self):
+        with open(self.path, 'wb') as fp:
+            fp.write(b'not an image')
+        with self.assertRaises(RuntimeError):
+            interpreter.Interpreter().loadImage(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
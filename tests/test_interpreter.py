@@ -0,0 +1,142 @@
+# Interpreters in one process: each keeps its own globals and output, can
+# be used again from inside another's primops or its own, runs closures
+# made by another with its own engine and globals, and can be used from
+# many threads at once.
+#
+#   python3 -m pytest tests      or      python3 -m unittest discover tests
+
+import os, sys, io, threading, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+import schemeast as ast
+import eval, interpreter
+
+engines = ('compile', 'cek', 'vm', 'tree')
+
+def number(sxp):
+    return sxp.number
+
+class IsolationTest(unittest.TestCase):
+    def test_globals(self):
+        for engine in engines:
+            with self.subTest(engine=engine):
+                a = interpreter.Interpreter(engine=engine)
+                b = interpreter.Interpreter(engine=engine)
+                a.evalString('(set x 1)')
+                b.evalString('(set x 2)')
+                a.evalString('(set + -)')
+                self.assertEqual(number(a.evalString('x')), 1)
+                self.assertEqual(number(b.evalString('x')), 2)
+                self.assertEqual(number(a.evalString('(+ 5 1)')), 4)
+                self.assertEqual(number(b.evalString('(+ 5 1)')), 6)
+
+                # a new interpreter starts from the builtins as they were
+                c = interpreter.Interpreter(engine=engine)
+                self.assertEqual(number(c.evalString('(+ 5 1)')), 6)
+                with self.assertRaises(RuntimeError):
+                    c.evalString('x')
+                self.assertEqual(eval.builtins['+'].name, '+')
+
+    def test_output(self):
+        a = interpreter.Interpreter(output=io.StringIO())
+        b = interpreter.Interpreter(output=io.StringIO())
+        a.evalString("(print 'one)")
+        b.evalString("(print 'two)")
+        self.assertEqual(a.output.getvalue(), 'one\n')
+        self.assertEqual(b.output.getvalue(), 'two\n')
+
+    def test_errors(self):
+        a = interpreter.Interpreter()
+        with self.assertRaises(RuntimeError):
+            a.evalString('(set x 1)\n(car 1)\n(set x 2)')
+        self.assertEqual(number(a.evalString('x')), 1)
+        with self.assertRaises(RuntimeError):
+            a.call('undefined-thing')
+        with self.assertRaises(ValueError):
+            interpreter.Interpreter(engine='fast')
+
+class ReentrancyTest(unittest.TestCase):
+    def test_primop_calls_other_interpreters(self):
+        # a primop of a that runs code in b, and in a itself, leaves each
+        # with its own globals
+        for engine in engines:
+            with self.subTest(engine=engine):
+                a = interpreter.Interpreter(engine=engine)
+                b = interpreter.Interpreter(engine='vm' if engine != 'vm' else 'cek')
+                a.evalString('(set x 1)')
+                b.evalString('(set x 2)')
+                def both(args):
+                    inner = b.evalString('(+ x 10)')
+                    mine = a.evalString('(+ x 100)')
+                    return ast.makeNum(inner.number + mine.number)
+                a.table.assign('both', ast.PrimOp('both', both, 0))
+                self.assertEqual(number(a.evalString('(+ x (both))')), 1 + 12 + 101)
+                self.assertEqual(number(a.evalString('x')), 1)
+                self.assertEqual(number(b.evalString('x')), 2)
+                self.assertIs(eval.globalEnv.table, eval.mainGlobals)
+
+class ClosureTest(unittest.TestCase):
+    def test_closure_sees_caller_globals(self):
+        for made in ('compile', 'cek', 'vm'):
+            for runs in ('compile', 'cek', 'vm'):
+                with self.subTest(made=made, runs=runs):
+                    a = interpreter.Interpreter(engine=made)
+                    b = interpreter.Interpreter(engine=runs)
+                    a.evalString('(set x 1)')
+                    b.evalString('(set x 2)')
+                    b.evalString('(set + *)')
+                    a.evalString('(define (f n) (+ x n))')
+                    f = a.table.lookup('f')
+                    self.assertEqual(number(a.call(f, ast.makeNum(5))), 6)
+                    self.assertEqual(number(b.call(f, ast.makeNum(5))), 10)
+                    self.assertEqual(number(a.call(f, ast.makeNum(5))), 6)
+
+    def test_tree_closures_do_not_mix(self):
+        a = interpreter.Interpreter(engine='tree')
+        b = interpreter.Interpreter(engine='compile')
+        a.evalString('(define (f n) n)')
+        with self.assertRaises(RuntimeError):
+            b.call(a.table.lookup('f'), ast.makeNum(1))
+        b.evalString('(define (g n) n)')
+        with self.assertRaises(RuntimeError):
+            a.call(b.table.lookup('g'), ast.makeNum(1))
+
+class ThreadTest(unittest.TestCase):
+    def test_interpreter_per_thread(self):
+        failures = []
+        def work(i):
+            interp = interpreter.Interpreter(engine=engines[i % len(engines)])
+            try:
+                interp.evalString('(set x {})'.format(i))
+                interp.evalString('(define (count n) (if (= n 0) x (count (- n 1))))')
+                for j in range(20):
+                    if number(interp.call('count', ast.makeNum(200))) != i:
+                        failures.append(i)
+            except RuntimeError as err:
+                failures.append(err)
+        threads = [ threading.Thread(target=work, args=(i,)) for i in range(8) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(failures, [])
+
+    def test_shared_interpreter(self):
+        # one interpreter used from several threads runs one at a time
+        interp = interpreter.Interpreter()
+        interp.evalString('(set n 0)')
+        interp.evalString('(define (bump) (begin (set m n) (set n (+ m 1))))')
+        def work():
+            for i in range(200):
+                interp.call('bump')
+        threads = [ threading.Thread(target=work) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(number(interp.evalString('n')), 800)
+
+if __name__ == '__main__':
+    unittest.main()
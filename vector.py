@@ -0,0 +1,175 @@
+import array, operator, itertools
+import schemeast as ast
+import eval
+import budget
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Vectors of integers in one contiguous buffer: a NumPy array when NumPy
+# is installed, otherwise an array.array of 64-bit integers.  Indexing is
+# O(1), and the bulk primitives below make one pass over the buffer in
+# native code rather than one Scheme call per element.
+#
+# Elements are 64-bit, and with or without NumPy an element that does not
+# fit is an error rather than wrapping around as in C: NumPy only does the
+# arithmetic when the largest elements show it cannot overflow, and the
+# rest is done on Python ints and checked.  Sums are Python ints, so they
+# never overflow.  Each element of a new vector counts as a cell against
+# the evaluation's budget (see budget.py).
+
+# the largest 64-bit integer
+largest = (1 << 63) - 1
+
+def fromInts(ints):
+    try:
+        if numpy is not None:
+            return numpy.array(list(ints), dtype=numpy.int64)
+        return array.array('q', ints)
+    except OverflowError:
+        raise RuntimeError("Vector element out of range")
+
+def charge(n):
+    if budget.counting[0]:
+        eval.globalEnv.meter.allocate(n)
+
+def checkVector(name, v):
+    if not isinstance(v, ast.VectorSxp):
+        raise RuntimeError("Argument of " + name + " not a vector")
+
+def checkNumber(name, n):
+    if not isinstance(n, ast.NumSxp):
+        raise RuntimeError("Argument of " + name + " not a number")
+
+def isVector(v):
+    if isinstance(v, ast.VectorSxp):
+        return ast.true
+    return ast.nil
+
+def length(v):
+    checkVector('vector-length', v)
+    return ast.makeNum(len(v.items))
+
+def checkIndex(name, v, i):
+    checkVector(name, v)
+    checkNumber(name, i)
+    if not 0 <= i.number < len(v.items):
+        raise RuntimeError("Index {} out of range in {}".format(i.number, name))
+
+def ref(v, i):
+    checkIndex('vector-ref', v, i)
+    return ast.makeNum(int(v.items[i.number]))
+
+def store(args):
+    v, i, x = args
+    checkIndex('vector-set!', v, i)
+    checkNumber('vector-set!', x)
+    try:
+        v.items[i.number] = x.number
+    except OverflowError:
+        raise RuntimeError("Vector element out of range")
+    return x
+
+def fromList(lst):
+    ints = []
+    while isinstance(lst, ast.ListSxp):
+        checkNumber('list->vector', lst.carval)
+        ints.append(lst.carval.number)
+        lst = lst.cdrval
+    if lst is not ast.nil:
+        raise RuntimeError("Argument of list->vector not a list")
+    charge(len(ints))
+    return ast.VectorSxp(fromInts(ints))
+
+def toList(v):
+    checkVector('vector->list', v)
+    charge(len(v.items))
+    return ast.buildList([ ast.makeNum(n) for n in v.items.tolist() ], ast.nil)
+
+def makeRange(start, end):
+    # the vector start, start+1, ..., end-1
+    checkNumber('vector-range', start)
+    checkNumber('vector-range', end)
+    charge(max(0, end.number - start.number))
+    if start.number < end.number and not (-largest - 1 <= start.number and end.number - 1 <= largest):
+        raise RuntimeError("Vector element out of range")
+    if numpy is not None:
+        return ast.VectorSxp(numpy.arange(start.number, end.number, dtype=numpy.int64))
+    return ast.VectorSxp(fromInts(range(start.number, end.number)))
+
+def total(v):
+    checkVector('vector-sum', v)
+    if numpy is not None and magnitude(v.items) * len(v.items) <= largest:
+        return ast.makeNum(int(v.items.sum()))
+    return ast.makeNum(sum(v.items.tolist()))
+
+def magnitude(items):
+    # the largest absolute value of the elements of a NumPy array, as a
+    # Python int
+    if len(items) == 0:
+        return 0
+    return max(-int(items.min()), int(items.max()))
+
+def fits(op, a, b):
+    # whether NumPy can apply op to arrays or numbers with these largest
+    # absolute values without overflowing
+    if op is operator.mul:
+        return a * b <= largest
+    if op is operator.floordiv:
+        return a <= largest
+    return a + b <= largest
+
+def elementwise(name, op):
+    # a primop applying op to two vectors of the same length element by
+    # element, or to each element of a vector and a number
+    def run(a, b):
+        checkVector(name, a)
+        if isinstance(b, ast.NumSxp):
+            if op is operator.floordiv and b.number == 0:
+                raise RuntimeError("Division by zero")
+            other = b.number
+        else:
+            checkVector(name, b)
+            if len(a.items) != len(b.items):
+                raise RuntimeError("Vectors of different lengths in " + name)
+            if op is operator.floordiv and 0 in b.items:
+                raise RuntimeError("Division by zero")
+            other = b.items
+        charge(len(a.items))
+        items = a.items
+        if numpy is not None:
+            otherSize = abs(other) if isinstance(other, int) else magnitude(other)
+            if fits(op, magnitude(items), otherSize):
+                return ast.VectorSxp(op(items, other))
+            items = items.tolist()
+            if not isinstance(other, int):
+                other = other.tolist()
+        if isinstance(other, int):
+            other = itertools.repeat(other, len(items))
+        return ast.VectorSxp(fromInts(map(op, items, other)))
+    return run
+
+add = elementwise('vector+', operator.add)
+subtract = elementwise('vector-', operator.sub)
+multiply = elementwise('vector*', operator.mul)
+divide = elementwise('vector/', operator.floordiv)
+
+def mapValues(f, v):
+    # apply a primop or closure to each element, which must give a number
+    checkVector('vector-map', v)
+    if isinstance(f, ast.PrimOp) and f.f1 is not None:
+        call = f.f1
+    elif isinstance(f, ast.PrimOp) or isinstance(f, ast.Closure):
+        call = lambda x: eval.apply(f, [x])
+    else:
+        raise RuntimeError("First argument of vector-map not a function")
+    charge(len(v.items))
+    ints = []
+    for n in v.items.tolist():
+        result = call(ast.makeNum(n))
+        if not isinstance(result, ast.NumSxp):
+            raise RuntimeError("vector-map function gave " + str(result) + ", not a number")
+        ints.append(result.number)
+    return ast.VectorSxp(fromInts(ints))
@@ -0,0 +1,401 @@
+import sys
+import schemeast as ast
+import eval
+import resolve
+import optimizer
+import memo
+
+# A bytecode engine.  An expression is compiled into a Code object: a flat
+# list of instructions, each an opcode followed by one integer operand,
+# plus a table of constants the operands index into.  The virtual machine
+# runs it on a single value stack.  Closure calls push the caller onto an
+# explicit call stack rather than recursing in Python, and calls in tail
+# position replace the current call, so deep recursion and tail calls
+# behave as they do in the cek engine.
+
+CONST, LOCAL, OUTER, GLOBAL, STORELOCAL, STOREGLOBAL, POP, JUMP, \
+    JUMPIFNIL, CLOSURE, CALL, TAILCALL, CALLPRIM, RETURN, FOLDED, BOX, \
+    UNBOX, SETBOX, DEFINE, REMEMBER, CHECK, CALLEE = range(22)
+
+opnames = ('CONST', 'LOCAL', 'OUTER', 'GLOBAL', 'STORELOCAL', 'STOREGLOBAL',
+    'POP', 'JUMP', 'JUMPIFNIL', 'CLOSURE', 'CALL', 'TAILCALL', 'CALLPRIM',
+    'RETURN', 'FOLDED', 'BOX', 'UNBOX', 'SETBOX', 'DEFINE', 'REMEMBER',
+    'CHECK', 'CALLEE')
+
+# what a memoized closure's call returns to: REMEMBER stores the value on
+# top of the stack in the memo, with the key, that are its only constant,
+# and RETURN goes on to the caller
+rememberCode = [REMEMBER, 0, RETURN, 0]
+
+class Code:
+    def __init__(self, source):
+        # what this code was compiled from, for the disassembler: a name
+        # or the Lambda itself, which is only printed if it is asked for
+        self.source = source
+
+        # opcode, operand, opcode, operand, ...
+        self.code = []
+
+        # constants, names, lambdas and call sites that operands refer
+        # to, and where each one is in that list
+        self.consts = []
+        self.constIndex = {}
+
+    def emit(self, op, arg=0):
+        self.code.append(op)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def patch(self, at, arg):
+        self.code[at+1] = arg
+
+    def here(self):
+        return len(self.code)
+
+    def const(self, value):
+        if id(value) not in self.constIndex:
+            self.constIndex[id(value)] = len(self.consts)
+            self.consts.append(value)
+        return self.constIndex[id(value)]
+
+def compile(exp):
+    resolve.resolve(exp)
+    code = Code('<input>')
+    compileExp(exp, code, True)
+    code.emit(RETURN)
+    return code
+
+def compileLambda(lam):
+    code = Code(lam)
+    for slot in lam.boxes:
+        code.emit(BOX, slot)
+    compileExp(lam.body, code, True)
+    code.emit(RETURN)
+    lam.bytecode = code
+    return code
+
+def compileExp(exp, code, tail):
+    if isinstance(exp, ast.ValExp):
+        code.emit(CONST, code.const(exp.sxp))
+
+    elif isinstance(exp, ast.Lambda):
+        compileLambda(exp)
+        code.emit(CLOSURE, code.const(exp))
+
+    elif isinstance(exp, ast.VarExp):
+        if exp.address is None:
+            # the VarExp itself, which keeps the cell it finds
+            code.emit(GLOBAL, code.const(exp))
+        else:
+            compileFetch(exp.address, code)
+            if exp.boxed:
+                code.emit(UNBOX)
+
+    elif exp.op == 'if':
+        compileExp(exp.args[0], code, False)
+        toElse = code.emit(JUMPIFNIL)
+        compileExp(exp.args[1], code, tail)
+        toEnd = code.emit(JUMP)
+        code.patch(toElse, code.here())
+        compileExp(exp.args[2], code, tail)
+        code.patch(toEnd, code.here())
+
+    elif exp.op == 'while':
+        start = code.here()
+        compileExp(exp.args[0], code, False)
+        toEnd = code.emit(JUMPIFNIL)
+        compileExp(exp.args[1], code, False)
+        code.emit(POP)
+        code.emit(JUMP, start)
+        code.patch(toEnd, code.here())
+        code.emit(CONST, code.const(eval.nilValue))
+
+    elif exp.op == 'set':
+        compileExp(exp.args[1], code, False)
+        if exp.address is None:
+            code.emit(STOREGLOBAL, code.const(exp.args[0]))
+        elif exp.boxed:
+            compileFetch(exp.address, code)
+            code.emit(SETBOX)
+        else:
+            # only boxed variables can be captured, so this is in the frame
+            code.emit(STORELOCAL, exp.address[1])
+
+    elif exp.op == 'define':
+        compileExp(exp.args[1], code, False)
+        code.emit(DEFINE, code.const(exp.args[0]))
+
+    elif exp.op == 'begin':
+        for elt in exp.args[:-1]:
+            compileExp(elt, code, False)
+            code.emit(POP)
+        compileExp(exp.args[-1], code, tail)
+
+    elif exp.folded is not None:
+        # FOLDED pushes the optimizer's value and jumps past the call for
+        # as long as the builtins it used are bound to their names
+        site = [exp.folded[0], exp.folded[1], 0]
+        code.emit(FOLDED, code.const(site))
+        compileCall(exp, code, tail)
+        site[2] = code.here()
+
+    else:
+        compileCall(exp, code, tail)
+
+def compileFetch(address, code):
+    # push what is at address, without looking inside a box
+    depth, slot = address
+    code.emit(LOCAL if depth == 0 else OUTER, slot)
+
+def compileCall(exp, code, tail):
+    # the operator is pushed and checked before the arguments are
+    # evaluated, as the tree engine does, so a call that fails has no
+    # side effects
+    prim = None
+    if isinstance(exp.op, ast.VarExp) and exp.op.address is None:
+        prim = eval.globalEnv.table.get(exp.op.name)
+    if isinstance(prim, ast.PrimOp) and prim.nargs == len(exp.args):
+        # a call through a global that holds a primop: CALLEE pushes the
+        # global, which only needs checking if it no longer holds the
+        # primop, and CALLPRIM calls the primop directly if it does
+        var = exp.op
+        code.emit(CALLEE, code.const((var, prim, len(exp.args))))
+        for elt in exp.args:
+            compileExp(elt, code, False)
+        site = (var, prim, len(exp.args), tail)
+        code.emit(CALLPRIM, code.const(site))
+
+    else:
+        compileExp(exp.op, code, False)
+        code.emit(CHECK, len(exp.args))
+        for elt in exp.args:
+            compileExp(elt, code, False)
+        code.emit(TAILCALL if tail else CALL, len(exp.args))
+
+def run(exp):
+    return execute(compile(exp), None)
+
+def apply(f, args):
+    # call a primop or closure on a list of already evaluated arguments
+    code = Code('<apply>')
+    code.emit(CONST, code.const(f))
+    code.emit(CHECK, len(args))
+    for arg in args:
+        code.emit(CONST, code.const(arg))
+    code.emit(CALL, len(args))
+    code.emit(RETURN)
+    return execute(code, None)
+
+def execute(top, frame):
+    PrimOp, Closure, Frame, Box = ast.PrimOp, ast.Closure, ast.Frame, ast.Box
+    Memo = memo.Memo
+    nilValue = eval.nilValue
+    table = eval.globalEnv.table
+    holds = optimizer.holds
+    meter = eval.globalEnv.meter
+
+    code, consts = top.code, top.consts
+    pc = 0
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    calls = []
+
+    while True:
+        op = code[pc]
+        arg = code[pc+1]
+        pc += 2
+
+        if op == CALLPRIM:
+            var, prim, nargs, tail = consts[arg]
+            if stack[-nargs-1] is prim:
+                if prim.f2 is not None:
+                    b = pop()
+                    a = pop()
+                    stack[-1] = prim.f2(a, b)
+                elif prim.f1 is not None:
+                    a = pop()
+                    stack[-1] = prim.f1(a)
+                else:
+                    args = stack[len(stack)-nargs:]
+                    del stack[len(stack)-nargs-1:]
+                    push(prim.f(args))
+                continue
+
+            # the builtin was rebound: make an ordinary call of whatever
+            # is under the arguments
+            op = TAILCALL if tail else CALL
+            arg = nargs
+
+        if op == LOCAL:
+            push(frame.values[arg])
+
+        elif op == FOLDED:
+            value, guards, end = consts[arg]
+            if holds(guards, table):
+                push(value)
+                pc = end
+
+        elif op == CONST:
+            push(consts[arg])
+
+        elif op == GLOBAL:
+            var = consts[arg]
+            if var.version == table.version:
+                push(var.cell.value)
+            else:
+                push(table.resolve(var).value)
+
+        elif op == JUMPIFNIL:
+            if pop() is nilValue:
+                pc = arg
+
+        elif op == CALL or op == TAILCALL:
+            # CHECK has made sure f can be called with these arguments
+            f = stack[-arg-1]
+            args = stack[len(stack)-arg:]
+            del stack[len(stack)-arg-1:]
+            remembering = None
+            if type(f) is Memo:
+                # run the closure here unless the memo has its result,
+                # returning through rememberCode
+                key, val = f.find(args)
+                if val is not None:
+                    push(val)
+                    continue
+                remembering = [(f, key)]
+                f = f.closure
+                check(f, arg)
+                if meter.limited:
+                    meter.fuel -= 1
+                    if meter.fuel <= 0:
+                        meter.refuel()
+            if isinstance(f, Closure):
+                lam = f.f
+                if op == CALL:
+                    calls.append((code, consts, pc, frame))
+                if remembering is not None:
+                    calls.append((rememberCode, remembering, 0, frame))
+                callee = lam.bytecode
+                if callee is None:
+                    callee = compileLambda(lam)
+                code, consts = callee.code, callee.consts
+                pc = 0
+                frame = Frame(args, f.environment)
+            else:
+                push(f.f(args))
+
+        elif op == CHECK:
+            # the operator, under its arg arguments to come
+            if check(stack[-1], arg) and meter.limited:
+                meter.fuel -= 1
+                if meter.fuel <= 0:
+                    meter.refuel()
+
+        elif op == CALLEE:
+            var, prim, nargs = consts[arg]
+            if var.version == table.version:
+                f = var.cell.value
+            else:
+                f = table.resolve(var).value
+            push(f)
+            if f is not prim and check(f, nargs) and meter.limited:
+                meter.fuel -= 1
+                if meter.fuel <= 0:
+                    meter.refuel()
+
+        elif op == RETURN:
+            if not calls:
+                return pop()
+            code, consts, pc, frame = calls.pop()
+
+        elif op == JUMP:
+            if arg < pc:
+                # the end of a while loop's body
+                if meter.limited:
+                    meter.fuel -= 1
+                    if meter.fuel <= 0:
+                        meter.refuel()
+            pc = arg
+
+        elif op == POP:
+            pop()
+
+        elif op == CLOSURE:
+            lam = consts[arg]
+            captured = []
+            for (depth, slot) in lam.free:
+                captured.append(frame.values[slot] if depth == 0 else frame.enclosed[slot])
+            push(Closure(lam, tuple(captured)))
+
+        elif op == STORELOCAL:
+            frame.values[arg] = stack[-1]
+
+        elif op == STOREGLOBAL:
+            table.assign(consts[arg], stack[-1])
+
+        elif op == OUTER:
+            push(frame.enclosed[arg])
+
+        elif op == UNBOX:
+            stack[-1] = stack[-1].value
+
+        elif op == SETBOX:
+            box = pop()
+            box.value = stack[-1]
+
+        elif op == BOX:
+            frame.values[arg] = Box(frame.values[arg])
+
+        elif op == DEFINE:
+            table.assign(consts[arg], stack[-1])
+            stack[-1] = ast.SymSxp(consts[arg])
+
+        elif op == REMEMBER:
+            m, key = consts[arg]
+            m.remember(key, stack[-1])
+
+def check(f, nargs):
+    # raise the error calling f with nargs arguments would, if any, and
+    # say whether f is a closure, whose call is a step
+    if isinstance(f, ast.Closure):
+        if len(f.f.formals) != nargs:
+            raise RuntimeError("Num args don't match in closure")
+        if f.f.bytecode is None and not isinstance(f.environment, tuple):
+            raise RuntimeError("Cannot apply a closure made by the tree engine")
+        return True
+    if isinstance(f, ast.PrimOp):
+        if f.nargs != nargs:
+            raise RuntimeError("Num args don't match in primop " + f.name)
+        return False
+    raise RuntimeError("Cannot apply " + str(f))
+
+def dis(code, out=sys.stdout):
+    # print the instructions of code, then of every lambda it creates
+    out.write('Disassembly of ' + str(code.source) + ':\n')
+    nested = []
+    for pc in range(0, len(code.code), 2):
+        op, arg = code.code[pc], code.code[pc+1]
+        line = '{:>6} {:<12}'.format(pc, opnames[op])
+        if op in (CONST, GLOBAL, STOREGLOBAL, DEFINE):
+            line += '{:>4} ({})'.format(arg, code.consts[arg])
+        elif op == CLOSURE:
+            line += '{:>4} (lambda)'.format(arg)
+            nested.append(code.consts[arg].bytecode)
+        elif op == FOLDED:
+            value, guards, end = code.consts[arg]
+            line += '{:>4} ({} or to {})'.format(arg, value, end)
+        elif op == CALLPRIM:
+            var, prim, nargs, tail = code.consts[arg]
+            line += '{:>4} ({} {}{})'.format(arg, var.name, nargs, ' tail' if tail else '')
+        elif op == CALLEE:
+            var, prim, nargs = code.consts[arg]
+            line += '{:>4} ({} {})'.format(arg, var.name, nargs)
+        elif op in (LOCAL, OUTER, STORELOCAL, CALL, TAILCALL, BOX, CHECK):
+            line += '{:>4}'.format(arg)
+        elif op in (JUMP, JUMPIFNIL):
+            line += '{:>4} (to {})'.format(arg, arg)
+        out.write(line.rstrip() + '\n')
+    for inner in nested:
+        out.write('\n')
+        dis(inner, out)